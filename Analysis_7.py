@@ -1,182 +1,338 @@
 import pandas as pd
+import numpy as np
 import seaborn as sns
 import matplotlib.pyplot as plt
+from matplotlib.cbook import boxplot_stats
 import os
 from scipy import stats
 import glob
+from concurrent.futures import ProcessPoolExecutor
 
 # Create the directory to save results
 output_dir = "Results_Analysis"
-os.makedirs(output_dir, exist_ok=True)
 
 # Path to the folder containing CSV files
 data_folder = 'C:/Users/Shree/Desktop/Projects/2023-hexoskin-study-data/Fuzzy_SQI_Results_6/'
 
-# Get list of all CSV files in the folder
-csv_files = glob.glob(os.path.join(data_folder, '*.csv'))
-
-# Initialize an empty DataFrame to combine all CSV files
-df = pd.DataFrame()
-
-# Read and combine all CSV files
-for file in csv_files:
-    temp_df = pd.read_csv(file)
-    df = pd.concat([df, temp_df], ignore_index=True)
-
-# 1. Comparison Between Participants
-# Aggregated Metrics Calculation
-df['Excellent'] = (df['Signal_Quality'] == 'Excellent')
-excellent_percentage = df.groupby('Participant')['Excellent'].mean() * 100
-mean_fuzzy_sqi = df.groupby('Participant')['Fuzzy_SQI'].mean()
-median_fuzzy_sqi = df.groupby('Participant')['Fuzzy_SQI'].median()
-
-# Difference Analysis (using Kruskal-Wallis test)
-participants = df['Participant'].unique()
-kruskal_results = stats.kruskal(*[df[df['Participant'] == participant]['Fuzzy_SQI'] for participant in participants])
-
-# Visualization: Boxplot and Histogram
-# Boxplot for signal quality by participant
-plt.figure(figsize=(10, 6))
-sns.boxplot(x='Participant', y='Fuzzy_SQI', data=df)
-plt.title('Signal Quality Distribution by Participant')
-plt.xlabel('Participant')
-plt.ylabel('Fuzzy SQI')
-boxplot_participant_path = os.path.join(output_dir, "boxplot_signal_quality_by_participant.png")
-plt.savefig(boxplot_participant_path)
-plt.close()
-
-# Histogram for percentage of "Excellent" quality
-plt.figure(figsize=(10, 6))
-sns.histplot(excellent_percentage, bins=10, kde=True)
-plt.title('Percentage of Excellent Time Windows by Participant')
-plt.xlabel('Percentage of Excellent Time Windows')
-plt.ylabel('Frequency')
-histogram_participant_path = os.path.join(output_dir, "histogram_excellent_quality_by_participant.png")
-plt.savefig(histogram_participant_path)
-plt.close()
-
-# 2. Comparison Between Activity Classes
-# Data Aggregation
-activity_classes = df['Activity_Class'].unique()
-activity_class_mean = df.groupby('Activity_Class')['Fuzzy_SQI'].mean()
-activity_class_excellent_percentage = df[df['Signal_Quality'] == 'Excellent'].groupby('Activity_Class').size() / df.groupby('Activity_Class').size() * 100
-
-# Statistical Analysis (Mann-Whitney U test between low and high activity classes)
-low_activity_data = df[df['Activity_Class'] == 'Low']['Fuzzy_SQI']
-high_activity_data = df[df['Activity_Class'] == 'High']['Fuzzy_SQI']
-mann_whitney_result = stats.mannwhitneyu(low_activity_data, high_activity_data)
-
-# Visualization: Boxplot and Bar Chart
-# Boxplot for signal quality by activity class
-plt.figure(figsize=(10, 6))
-sns.boxplot(x='Activity_Class', y='Fuzzy_SQI', data=df)
-plt.title('Signal Quality Distribution by Activity Class')
-plt.xlabel('Activity Class')
-plt.ylabel('Fuzzy SQI')
-boxplot_activity_path = os.path.join(output_dir, "boxplot_signal_quality_by_activity.png")
-plt.savefig(boxplot_activity_path)
-plt.close()
-
-# Bar Chart for percentage of "Excellent" quality per activity class
-plt.figure(figsize=(10, 6))
-activity_class_excellent_percentage.plot(kind='bar', color='purple')
-plt.title('Percentage of Excellent Time Windows by Activity Class')
-plt.xlabel('Activity Class')
-plt.ylabel('Percentage')
-bar_chart_activity_path = os.path.join(output_dir, "bar_chart_excellent_quality_by_activity.png")
-plt.savefig(bar_chart_activity_path)
-plt.close()
-
-# 3. Temporal Analysis
-# Time-Based Aggregation: Add Timestamp if needed
-df['Timestamp'] = pd.to_datetime(df['Window_Index'], unit='s')  # Assuming Window_Index is in seconds
-
-# Temporal Trend Calculation for each participant
-plt.figure(figsize=(10, 6))
-for participant in df['Participant'].unique():
-    participant_data = df[df['Participant'] == participant]
-    plt.plot(participant_data['Timestamp'], participant_data['Fuzzy_SQI'], label=f'Participant {participant}')
-plt.title('Temporal Trend of Signal Quality per Participant')
-plt.xlabel('Timestamp')
-plt.ylabel('Fuzzy SQI')
-line_plot_path = os.path.join(output_dir, "temporal_trend_signal_quality.png")
-plt.savefig(line_plot_path)
-plt.close()
-
-# 4. Detailed Visualization
-# 1. Histograms
-plt.figure(figsize=(10, 6))
-sns.histplot(df['Fuzzy_SQI'], bins=30, kde=True)
-plt.title('Distribution of Fuzzy SQI Values for All Participants')
-plt.xlabel('Fuzzy SQI')
-plt.ylabel('Frequency')
-histogram_path = os.path.join(output_dir, "fuzzy_sqi_histogram_all.png")
-plt.savefig(histogram_path)
-plt.close()
-
-# For specific activity classes
-plt.figure(figsize=(10, 6))
-sns.histplot(df[df['Activity_Class'] == 'Low']['Fuzzy_SQI'], bins=30, kde=True, color='blue', label='Low Activity')
-sns.histplot(df[df['Activity_Class'] == 'Medium']['Fuzzy_SQI'], bins=30, kde=True, color='orange', label='Medium Activity')
-sns.histplot(df[df['Activity_Class'] == 'High']['Fuzzy_SQI'], bins=30, kde=True, color='green', label='High Activity')
-plt.title('Distribution of Fuzzy SQI Values by Activity Class')
-plt.xlabel('Fuzzy SQI')
-plt.ylabel('Frequency')
-plt.legend()
-histogram_activity_path = os.path.join(output_dir, "fuzzy_sqi_histogram_by_activity.png")
-plt.savefig(histogram_activity_path)
-plt.close()
-
-# 2. Line Plots
-plt.figure(figsize=(10, 6))
-for participant in df['Participant'].unique():
-    participant_data = df[df['Participant'] == participant]
-    plt.plot(participant_data['Timestamp'], participant_data['Fuzzy_SQI'], label=f'Participant {participant}')
-plt.title('Temporal Trend of Signal Quality per Participant')
-plt.xlabel('Timestamp')
-plt.ylabel('Fuzzy SQI')
-line_plot_path = os.path.join(output_dir, "temporal_trend_signal_quality.png")
-plt.savefig(line_plot_path)
-plt.close()
-
-# 3. Boxplots: Compare signal quality between participants or activity classes
-plt.figure(figsize=(10, 6))
-sns.boxplot(x='Participant', y='Fuzzy_SQI', data=df)
-plt.title('Signal Quality Distribution by Participant')
-plt.xlabel('Participant')
-plt.ylabel('Fuzzy SQI')
-boxplot_participant_path = os.path.join(output_dir, "boxplot_signal_quality_by_participant.png")
-plt.savefig(boxplot_participant_path)
-plt.close()
-
-plt.figure(figsize=(10, 6))
-sns.boxplot(x='Activity_Class', y='Fuzzy_SQI', data=df)
-plt.title('Signal Quality Distribution by Activity Class')
-plt.xlabel('Activity Class')
-plt.ylabel('Fuzzy SQI')
-boxplot_activity_path = os.path.join(output_dir, "boxplot_signal_quality_by_activity.png")
-plt.savefig(boxplot_activity_path)
-plt.close()
-
-# 4. Bar Charts: Compare average signal quality or percentage of "Excellent" time windows per activity class
-excellent_percentage = df[df['Signal_Quality'] == 'Excellent'].groupby('Activity_Class').size() / df.groupby('Activity_Class').size() * 100
-plt.figure(figsize=(10, 6))
-excellent_percentage.plot(kind='bar', color='purple')
-plt.title('Percentage of Excellent Time Windows by Activity Class')
-plt.xlabel('Activity Class')
-plt.ylabel('Percentage')
-bar_chart_activity_path = os.path.join(output_dir, "bar_chart_excellent_quality_by_activity.png")
-plt.savefig(bar_chart_activity_path)
-plt.close()
-
-# Average signal quality by activity class
-avg_signal_quality = df.groupby('Activity_Class')['Fuzzy_SQI'].mean()
-plt.figure(figsize=(10, 6))
-avg_signal_quality.plot(kind='bar', color='cyan')
-plt.title('Average Signal Quality by Activity Class')
-plt.xlabel('Activity Class')
-plt.ylabel('Average Fuzzy SQI')
-bar_chart_avg_quality_path = os.path.join(output_dir, "bar_chart_avg_signal_quality_by_activity.png")
-plt.savefig(bar_chart_avg_quality_path)
-plt.close()
+# Resampling settings
+n_bootstrap = 2000          # Bootstrap resamples for the confidence intervals
+n_permutations = 10000      # Label permutations for the permutation tests
+confidence = 0.95
+chunk_elements = 5_000_000  # Resamples x windows handled at once, bounds the memory of one task
+seed = 0
 
+activity_order = ['Low', 'Medium', 'High']
+
+# Fuzzy SQI lies in [0, 1]: every file is reduced to counts over fixed fine bins, from which the
+# cohort histograms (30 bins of 40 fine bins each) and the boxplot statistics are drawn
+fine_bins = 1200
+fine_edges = np.linspace(0, 1, fine_bins + 1)
+histogram_bins = 30
+
+
+# Bootstrap confidence interval of the mean, resampling in vectorized chunks.
+# A bootstrap mean is a multinomial draw of counts times the values, divided by n.
+def bootstrap_mean_ci(values, rng, n_resamples=n_bootstrap):
+    n = len(values)
+    if n == 0:
+        return np.nan, np.nan
+    chunk = max(1, chunk_elements // n)
+    means = []
+    for start in range(0, n_resamples, chunk):
+        counts = rng.multinomial(n, np.full(n, 1 / n), size=min(chunk, n_resamples - start))
+        means.append(counts @ values / n)
+    alpha = (1 - confidence) / 2
+    return tuple(np.quantile(np.concatenate(means), [alpha, 1 - alpha]))
+
+
+# Read one participant file and reduce it to what the analysis needs: compact arrays for the
+# rank and permutation tests, and per-participant / per-class sufficient statistics
+def summarize_file(args):
+    file, file_seed = args
+    df = pd.read_csv(file, usecols=['Participant', 'Window_Index', 'Activity_Class', 'Fuzzy_SQI', 'Signal_Quality'])
+    df = df.dropna(subset=['Fuzzy_SQI'])
+    rng = np.random.default_rng(file_seed)
+
+    sqi = df['Fuzzy_SQI'].to_numpy(dtype=np.float64)
+    excellent = (df['Signal_Quality'] == 'Excellent').to_numpy()
+    activity = pd.Categorical(df['Activity_Class'], categories=activity_order).codes.astype(np.int8)
+
+    known = activity >= 0
+    n_classes = len(activity_order)
+    fine = np.clip((sqi * fine_bins).astype(int), 0, fine_bins - 1)
+    class_counts = np.bincount(activity[known].astype(int) * fine_bins + fine[known], minlength=n_classes * fine_bins)
+    return {
+        'participant': str(df['Participant'].iloc[0]) if len(df) else os.path.basename(file),
+        'sqi': sqi.astype(np.float32),
+        'activity': activity,
+        'window_index': df['Window_Index'].to_numpy(dtype=np.int32),
+        'n': len(sqi),
+        'sum': sqi.sum(),
+        'median': np.median(sqi) if len(sqi) else np.nan,
+        'excellent': int(excellent.sum()),
+        'ci': bootstrap_mean_ci(sqi, rng),
+        'box': boxplot_stats(sqi)[0] if len(sqi) else None,
+        'class_n': np.bincount(activity[known], minlength=n_classes),
+        'class_sum': np.bincount(activity[known], weights=sqi[known], minlength=n_classes),
+        'class_excellent': np.bincount(activity[known], weights=excellent[known], minlength=n_classes),
+        'counts': np.bincount(fine, minlength=fine_bins),
+        'class_counts': class_counts.reshape(n_classes, fine_bins),
+    }
+
+
+# Boxplot statistics (quartiles and 1.5 IQR whiskers) from counts over the fine bins,
+# exact to the bin width
+def boxplot_stats_from_counts(counts, mean):
+    centers = (fine_edges[:-1] + fine_edges[1:]) / 2
+    cumulative = np.cumsum(counts)
+    q1, med, q3 = centers[np.searchsorted(cumulative, np.array([0.25, 0.5, 0.75]) * cumulative[-1])]
+    filled = centers[counts > 0]
+    iqr = q3 - q1
+    return {
+        'mean': mean, 'med': med, 'q1': q1, 'q3': q3, 'iqr': iqr,
+        'whislo': filled[filled >= q1 - 1.5 * iqr].min(),
+        'whishi': filled[filled <= q3 + 1.5 * iqr].max(),
+        'fliers': np.array([]),
+    }
+
+
+# Arrays shared by the permutation workers, set once per process by the pool initializer
+shared = {}
+
+def init_worker(values, groups, blocks):
+    shared['values'] = values
+    shared['groups'] = groups
+    shared['blocks'] = blocks
+
+# Group sums of the values for a chunk of label permutations (rows = permutations).
+# Labels are only shuffled within each contiguous block (blocks holds the block boundaries;
+# one block covering all values shuffles them freely), each block with one linear-time shuffle.
+def permuted_group_sums(args):
+    n_perm, n_groups, perm_seed = args
+    values, groups, blocks = shared['values'], shared['groups'], shared['blocks']
+    rng = np.random.default_rng(perm_seed)
+
+    permuted = np.empty((n_perm, len(groups)), dtype=groups.dtype)
+    for start, stop in zip(blocks[:-1], blocks[1:]):
+        permuted[:, start:stop] = rng.permuted(np.broadcast_to(groups[start:stop], (n_perm, stop - start)), axis=1)
+    offsets = np.arange(n_perm)[:, None] * n_groups
+    sums = np.bincount((permuted + offsets).ravel(), weights=np.tile(values, n_perm), minlength=n_perm * n_groups)
+    return sums.reshape(n_perm, n_groups)
+
+# Permutation test of a statistic computed from group sums, run in chunks over the process pool.
+# strata (sorted) keeps the labels within each stratum; two_sided compares absolute values.
+def permutation_test(values, groups, n_groups, statistic, strata=None, two_sided=False,
+                     n_resamples=n_permutations, test_seed=seed):
+    counts = np.bincount(groups, minlength=n_groups)
+    observed = statistic(np.bincount(groups, weights=values, minlength=n_groups)[None, :], counts)[0]
+
+    # Boundaries of the blocks of equal stratum (a single block without strata)
+    boundaries = np.flatnonzero(np.diff(strata)) + 1 if strata is not None else []
+    blocks = np.concatenate(([0], boundaries, [len(values)])).astype(int)
+
+    chunk = max(1, chunk_elements // len(values))
+    sizes = [min(chunk, n_resamples - start) for start in range(0, n_resamples, chunk)]
+    seeds = np.random.SeedSequence(test_seed).generate_state(len(sizes))
+    with ProcessPoolExecutor(initializer=init_worker, initargs=(values, groups, blocks)) as pool:
+        permuted = np.concatenate([
+            statistic(sums, counts)
+            for sums in pool.map(permuted_group_sums, [(size, n_groups, s) for size, s in zip(sizes, seeds)])
+        ])
+    if two_sided:
+        p_value = (1 + np.sum(np.abs(permuted) >= abs(observed))) / (1 + n_resamples)
+    else:
+        p_value = (1 + np.sum(permuted >= observed)) / (1 + n_resamples)
+    return observed, p_value
+
+# Between-group sum of squares up to a constant (the total is the same for every permutation)
+def between_groups(sums, counts):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.nansum(sums ** 2 / counts, axis=1)
+
+# Difference between the mean of the last and the first group
+def mean_difference(sums, counts):
+    return sums[:, -1] / counts[-1] - sums[:, 0] / counts[0]
+
+
+# Save the current figure and close it
+def save_figure(name):
+    path = os.path.join(output_dir, name)
+    plt.savefig(path)
+    plt.close()
+    return path
+
+# Histogram drawn from precomputed counts
+def histogram_from_counts(counts, edges, **kwargs):
+    plt.hist(edges[:-1], bins=edges, weights=counts, **kwargs)
+
+
+def main():
+    os.makedirs(output_dir, exist_ok=True)
+
+    # Get list of all CSV files in the folder
+    csv_files = sorted(glob.glob(os.path.join(data_folder, '*.csv')))
+    if not csv_files:
+        print(f"No Fuzzy SQI results found in {data_folder}")
+        return
+    file_seeds = np.random.SeedSequence(seed).generate_state(len(csv_files))
+
+    # Summarize every participant file in parallel
+    with ProcessPoolExecutor() as pool:
+        summaries = [s for s in pool.map(summarize_file, zip(csv_files, file_seeds)) if s['n'] > 0]
+    if not summaries:
+        print(f"No Fuzzy SQI values found in {data_folder}")
+        return
+
+    # Window arrays of the whole cohort, only for the rank and permutation tests
+    participants = [s['participant'] for s in summaries]
+    sqi = np.concatenate([s['sqi'] for s in summaries]).astype(np.float64)
+    activity = np.concatenate([s['activity'] for s in summaries])
+    participant_codes = np.repeat(np.arange(len(summaries)), [s['n'] for s in summaries]).astype(np.int32)
+
+    # 1. Comparison Between Participants
+    # Aggregated Metrics Calculation
+    participant_summary = pd.DataFrame({
+        'Participant': participants,
+        'Windows': [s['n'] for s in summaries],
+        'Mean_Fuzzy_SQI': [s['sum'] / s['n'] for s in summaries],
+        'Median_Fuzzy_SQI': [s['median'] for s in summaries],
+        'Mean_CI_Low': [s['ci'][0] for s in summaries],
+        'Mean_CI_High': [s['ci'][1] for s in summaries],
+        'Excellent (%)': [100 * s['excellent'] / s['n'] for s in summaries],
+    })
+    participant_summary.to_csv(os.path.join(output_dir, "participant_summary.csv"), index=False)
+
+    # 2. Comparison Between Activity Classes
+    # Data Aggregation from the per-participant sums; the confidence interval resamples
+    # participants (cluster bootstrap), as windows of one participant are not independent
+    present = np.sum([s['class_n'] for s in summaries], axis=0) > 0
+    class_names = [ac for ac, p in zip(activity_order, present) if p]
+    class_n = np.array([s['class_n'][present] for s in summaries], dtype=float)
+    class_sum = np.array([s['class_sum'][present] for s in summaries])
+    class_excellent = np.array([s['class_excellent'][present] for s in summaries])
+    rng = np.random.default_rng(seed)
+    weights = rng.multinomial(len(summaries), np.full(len(summaries), 1 / len(summaries)), size=n_bootstrap)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        bootstrap_means = (weights @ class_sum) / (weights @ class_n)
+        alpha = (1 - confidence) / 2
+        ci_low, ci_high = np.nanquantile(bootstrap_means, [alpha, 1 - alpha], axis=0)
+        activity_summary = pd.DataFrame({
+            'Activity_Class': class_names,
+            'Windows': class_n.sum(axis=0).astype(int),
+            'Mean_Fuzzy_SQI': class_sum.sum(axis=0) / class_n.sum(axis=0),
+            'Mean_CI_Low': ci_low,
+            'Mean_CI_High': ci_high,
+            'Excellent (%)': 100 * class_excellent.sum(axis=0) / class_n.sum(axis=0),
+        })
+    activity_summary.to_csv(os.path.join(output_dir, "activity_class_summary.csv"), index=False)
+
+    # Statistical Analysis
+    tests = []
+
+    # Difference between participants: Kruskal-Wallis and a permutation test of the between-participant variance
+    if len(summaries) > 1:
+        kruskal_results = stats.kruskal(*[s['sqi'] for s in summaries])
+        tests.append(('Kruskal-Wallis (participants)', kruskal_results.statistic, kruskal_results.pvalue))
+        observed, p_value = permutation_test(sqi, participant_codes, len(summaries), between_groups)
+        tests.append(('Permutation, between-participant variance', observed, p_value))
+
+    # Low vs. high activity: Mann-Whitney U and a permutation test of the mean difference,
+    # shuffling the activity labels within each participant
+    low, high = activity_order.index('Low'), activity_order.index('High')
+    low_high = (activity == low) | (activity == high)
+    if np.any(activity == low) and np.any(activity == high):
+        mann_whitney_result = stats.mannwhitneyu(sqi[activity == low], sqi[activity == high])
+        tests.append(('Mann-Whitney U (Low vs. High)', mann_whitney_result.statistic, mann_whitney_result.pvalue))
+        observed, p_value = permutation_test(
+            sqi[low_high], (activity[low_high] == high).astype(np.int32), 2, mean_difference,
+            strata=participant_codes[low_high], two_sided=True,
+        )
+        tests.append(('Permutation, mean difference High - Low within participants (two-sided)', observed, p_value))
+
+    pd.DataFrame(tests, columns=['Test', 'Statistic', 'P_Value']).to_csv(
+        os.path.join(output_dir, "statistical_tests.csv"), index=False)
+
+    # Visualization: every figure is drawn once
+    # Boxplot for signal quality by participant
+    plt.figure(figsize=(10, 6))
+    plt.gca().bxp([dict(s['box'], label=s['participant']) for s in summaries], showfliers=False)
+    plt.title('Signal Quality Distribution by Participant')
+    plt.xlabel('Participant')
+    plt.ylabel('Fuzzy SQI')
+    save_figure("boxplot_signal_quality_by_participant.png")
+
+    # Histogram for percentage of "Excellent" quality
+    plt.figure(figsize=(10, 6))
+    sns.histplot(participant_summary['Excellent (%)'], bins=10, kde=len(summaries) > 1)
+    plt.title('Percentage of Excellent Time Windows by Participant')
+    plt.xlabel('Percentage of Excellent Time Windows')
+    plt.ylabel('Frequency')
+    save_figure("histogram_excellent_quality_by_participant.png")
+
+    # Boxplot for signal quality by activity class
+    plt.figure(figsize=(10, 6))
+    class_counts = np.sum([s['class_counts'] for s in summaries], axis=0)
+    plt.gca().bxp([dict(boxplot_stats_from_counts(class_counts[activity_order.index(ac)], mean), label=ac)
+                   for ac, mean in zip(activity_summary['Activity_Class'], activity_summary['Mean_Fuzzy_SQI'])],
+                  showfliers=False)
+    plt.title('Signal Quality Distribution by Activity Class')
+    plt.xlabel('Activity Class')
+    plt.ylabel('Fuzzy SQI')
+    save_figure("boxplot_signal_quality_by_activity.png")
+
+    # Bar Chart for percentage of "Excellent" quality per activity class
+    plt.figure(figsize=(10, 6))
+    activity_summary.set_index('Activity_Class')['Excellent (%)'].plot(kind='bar', color='purple')
+    plt.title('Percentage of Excellent Time Windows by Activity Class')
+    plt.xlabel('Activity Class')
+    plt.ylabel('Percentage')
+    save_figure("bar_chart_excellent_quality_by_activity.png")
+
+    # Average signal quality by activity class, with the bootstrap confidence interval
+    plt.figure(figsize=(10, 6))
+    means = activity_summary['Mean_Fuzzy_SQI']
+    errors = [means - activity_summary['Mean_CI_Low'], activity_summary['Mean_CI_High'] - means]
+    plt.bar(activity_summary['Activity_Class'], means, yerr=errors, color='cyan', capsize=4)
+    plt.title('Average Signal Quality by Activity Class')
+    plt.xlabel('Activity Class')
+    plt.ylabel('Average Fuzzy SQI')
+    save_figure("bar_chart_avg_signal_quality_by_activity.png")
+
+    # 3. Temporal Analysis
+    # Temporal Trend per participant (Window_Index taken as seconds)
+    plt.figure(figsize=(10, 6))
+    for s in summaries:
+        plt.plot(pd.to_datetime(s['window_index'], unit='s'), s['sqi'], label=f"Participant {s['participant']}")
+    plt.title('Temporal Trend of Signal Quality per Participant')
+    plt.xlabel('Timestamp')
+    plt.ylabel('Fuzzy SQI')
+    save_figure("temporal_trend_signal_quality.png")
+
+    # 4. Histograms from the fine-bin counts of the participant files
+    edges = fine_edges[::fine_bins // histogram_bins]
+    def coarse(counts):
+        return counts.reshape(histogram_bins, -1).sum(axis=1)
+    plt.figure(figsize=(10, 6))
+    histogram_from_counts(coarse(np.sum([s['counts'] for s in summaries], axis=0)), edges)
+    plt.title('Distribution of Fuzzy SQI Values for All Participants')
+    plt.xlabel('Fuzzy SQI')
+    plt.ylabel('Frequency')
+    save_figure("fuzzy_sqi_histogram_all.png")
+
+    # For specific activity classes
+    colors = {'Low': 'blue', 'Medium': 'orange', 'High': 'green'}
+    plt.figure(figsize=(10, 6))
+    for ac in activity_summary['Activity_Class']:
+        counts = coarse(class_counts[activity_order.index(ac)])
+        histogram_from_counts(counts, edges, color=colors[ac], alpha=0.5, label=f'{ac} Activity')
+    plt.title('Distribution of Fuzzy SQI Values by Activity Class')
+    plt.xlabel('Fuzzy SQI')
+    plt.ylabel('Frequency')
+    plt.legend()
+    save_figure("fuzzy_sqi_histogram_by_activity.png")
+
+    print(f"Analysis of {len(summaries)} participants saved in: {output_dir}")
+
+
+if __name__ == "__main__":
+    main()
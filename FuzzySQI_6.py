@@ -3,23 +3,71 @@ import pandas as pd
 import skfuzzy as fuzz
 import os
 import matplotlib.pyplot as plt
+from scipy.signal import welch
+from scipy.stats import kurtosis, skew
+from checkpoint import atomic_path
+
+# Coefficient of variation of the values falling in each window (NaN with fewer than 2 values)
+def window_cv(values, window, num_windows):
+    keep = window < num_windows
+    values, window = values[keep], window[keep]
+    n = np.bincount(window, minlength=num_windows)
+    total = np.bincount(window, weights=values, minlength=num_windows)
+    squares = np.bincount(window, weights=values ** 2, minlength=num_windows)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean = total / n
+        cv = np.sqrt(np.maximum(squares / n - mean ** 2, 0)) / np.abs(mean)
+    cv[n < 2] = np.nan
+    return cv
+
+# Define feature calculation functions, per window (peaks: R-peak sample indices)
+def amplitude_stability(peaks, amplitudes, num_windows, window_samples):
+    return window_cv(amplitudes, peaks // window_samples, num_windows)
+
+def rr_interval_variability(peaks, num_windows, window_samples):
+    rr_intervals = np.diff(peaks)
+    return window_cv(rr_intervals, peaks[1:] // window_samples, num_windows)
+
+# Spectral SQI features of all windows at once (windows x samples array):
+# Welch power spectra along axis 1, then QRS-band and noise-band powers per window
+def spectral_sqi(windows, sample_rate):
+    freqs, psd = welch(windows, fs=sample_rate, nperseg=min(2 * sample_rate, windows.shape[1]), axis=1)
+
+    def band_power(low, high):
+        return psd[:, (freqs >= low) & (freqs < high)].sum(axis=1)
+
+    qrs = band_power(5, 15)             # QRS complex
+    baseline = band_power(0, 1)         # Baseline wander
+    ecg_band = band_power(5, 40)
+    low_band = band_power(0, 40)
+    high = band_power(40, np.inf)       # Muscle and powerline noise
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return pd.DataFrame({
+            'SNR_dB': 10 * np.log10(qrs / (baseline + high)),    # QRS power vs. baseline and high-frequency noise
+            'pSQI': qrs / ecg_band,                             # Share of QRS power in the ECG band
+            'basSQI': 1 - baseline / low_band,                  # Share of power outside the baseline band
+            'kSQI': kurtosis(windows, axis=1, fisher=False),    # Peaky (clean) ECG has a high kurtosis
+            'sSQI': skew(windows, axis=1),
+        })
 
-# Define feature calculation functions
-def amplitude_stability(r_peaks):
-    return np.std(r_peaks)
-
-def rr_interval_variability(r_peaks):
-    rr_intervals = np.diff(r_peaks)
-    return np.std(rr_intervals)
+# Map a feature linearly to [0, 1] between a bad and a good value; a missing feature counts as bad
+def feature_score(value, bad, good):
+    return np.nan_to_num(np.clip((np.asarray(value, dtype=float) - bad) / (good - bad), 0, 1))
 
-def snr(signal, noise):
-    signal_power = np.sum(signal ** 2)
-    noise_power = np.sum(noise ** 2)
-    return 10 * np.log10(signal_power / noise_power)
+# Spectral SQI features mapped to [0, 1] and averaged
+def spectral_score(features):
+    return np.mean([
+        feature_score(features['SNR_dB'], 0, 10),
+        feature_score(features['pSQI'], 0.2, 0.5),
+        feature_score(features['basSQI'], 0.8, 1),
+        feature_score(features['kSQI'], 3, 5),
+    ], axis=0)
 
-# Heuristic Fusion to Calculate Quality Value with Weights
-def quality_value(amplitude_stability, rr_variability, snr_value, w1=0.4, w2=0.3, w3=0.3):
-    return w1 * amplitude_stability + w2 * rr_variability + w3 * snr_value
+# Heuristic Fusion to Calculate Quality Value with Weights; every input is a score in [0, 1]
+# (1 = clean ECG), so the quality value stays in [0, 1] and no feature saturates it
+def quality_value(amplitude_score, rr_score, spectral_score, w1=0.4, w2=0.3, w3=0.3):
+    return w1 * amplitude_score + w2 * rr_score + w3 * spectral_score
 
 # Fuzzy Logic Classification
 def fuzzy_classification(quality_val):
@@ -42,14 +90,14 @@ def fuzzy_classification(quality_val):
     else:
         return 'Unacceptable'
 
-# Segmented Signal Processing
+# Segmented Signal Processing: full windows as a 2-D array (windows x samples)
 def segment_signal(signal, window_size=10, sample_rate=1000):
-    windows = []
     step = window_size * sample_rate
-    for i in range(0, len(signal), step):
-        window = signal[i:i + step]
-        windows.append(window)
-    return windows
+    num_windows = len(signal) // step
+    return np.asarray(signal[:num_windows * step], dtype=float).reshape(num_windows, step)
+
+# ECG sampling rate of the R-peak files (Hz)
+sampling_rate = 256
 
 # Create the folder to save results
 folder_path = r"C:\Users\Shree\Desktop\Projects\2023-hexoskin-study-data\Fuzzy_SQI_Results_6"
@@ -59,13 +107,16 @@ os.makedirs(folder_path, exist_ok=True)
 r_peak_data_path = r"C:\Users\Shree\Desktop\Projects\2023-hexoskin-study-data\R-Peak_data_5"
 classification_data_path = r"C:\Users\Shree\Desktop\Projects\2023-hexoskin-study-data\classification_data_4"
 
-r_peak_files = os.listdir(r_peak_data_path)
-classification_files = os.listdir(classification_data_path)
+r_peak_files = sorted(f for f in os.listdir(r_peak_data_path) if f.endswith('.csv'))
 
-# Process each participant's data
-for r_file, c_file in zip(r_peak_files, classification_files):
+# Process each participant's data, with the activity classification written for the same file
+for r_file in r_peak_files:
     r_peak_file_path = os.path.join(r_peak_data_path, r_file)
+    c_file = f"{r_file}_activity_classification.csv"
     classification_file_path = os.path.join(classification_data_path, c_file)
+    if not os.path.exists(classification_file_path):
+        print(f"Skipping {r_file}: no activity classification {c_file}")
+        continue
 
     # Create a subfolder for each participant to store results
     participant_folder = os.path.join(folder_path, r_file.split('.')[0])  # Folder for each participant
@@ -84,15 +135,16 @@ for r_file, c_file in zip(r_peak_files, classification_files):
         print(f"Error reading Classification file {c_file}: {e}")
         continue
 
-    if 'R-Peak Index' not in r_peak_df.columns:
-        print(f"The R-peak file is missing the 'R-Peak Index' column. Available columns are: {', '.join(r_peak_df.columns)}")
+    if 'R-Peak Value' not in r_peak_df.columns:
+        print(f"The R-peak file is missing the 'R-Peak Value' column. Available columns are: {', '.join(r_peak_df.columns)}")
         continue
 
     if 'Activity Class' not in classification_df.columns:
         print(f"The classification file is missing the 'Activity Class' column. Available columns are: {', '.join(classification_df.columns)}")
         continue
 
-    r_peaks = r_peak_df['R-Peak Index'].dropna().values
+    # R-peaks are the samples that carry an R-peak value
+    r_peaks = np.flatnonzero(r_peak_df['R-Peak Value'].notna().values)
     activity_classes = classification_df['Activity Class'].tolist()
 
     # Assuming ECG signal is also present in R-peak file
@@ -103,23 +155,32 @@ for r_file, c_file in zip(r_peak_files, classification_files):
         continue
 
     # Segment the signal
-    windows = segment_signal(ecg_signal)
+    windows = segment_signal(ecg_signal, sample_rate=sampling_rate)[:len(activity_classes)]
+    if windows.shape[0] == 0:
+        print(f"Skipping {r_file}: no full 10-second window with an activity class")
+        continue
+
+    # Calculate the features of all windows in one pass: R-peak amplitude and RR interval
+    # variation (coefficient of variation) and the spectral features
+    num_windows, window_samples = windows.shape
+    spectral_features = spectral_sqi(windows, sampling_rate)
+    spectral_features['Amplitude_CV'] = amplitude_stability(r_peaks, ecg_signal[r_peaks], num_windows, window_samples)
+    spectral_features['RR_CV'] = rr_interval_variability(r_peaks, num_windows, window_samples)
+
+    # Scores in [0, 1]: amplitude CV 0.1 or less and RR CV 0.1 or less count as clean,
+    # 0.5 and 0.3 or more (missed or extra beats) as noise
+    amplitude_scores = feature_score(spectral_features['Amplitude_CV'], 0.5, 0.1)
+    rr_scores = feature_score(spectral_features['RR_CV'], 0.3, 0.1)
+    spectral_scores = spectral_score(spectral_features)
 
     # Initialize a list to store results for this participant
     sqi_results = []
 
     # For each window (segment), calculate Fuzzy SQI, classify the signal quality, and compute Quality Value
-    for idx, window in enumerate(windows):
-        if idx >= len(activity_classes):
-            break
-
+    for idx, features in spectral_features.iterrows():
         activity_class = activity_classes[idx]
 
-        # Calculate features for the current window
-        amp_stability = amplitude_stability(r_peaks)
-        rr_variability = rr_interval_variability(r_peaks)
-        snr_value = snr(window, ecg_signal)
-        quality_val = quality_value(amp_stability, rr_variability, snr_value)
+        quality_val = quality_value(amplitude_scores[idx], rr_scores[idx], spectral_scores[idx])
 
         # Classify signal quality using fuzzy logic
         classification = fuzzy_classification(quality_val)
@@ -130,7 +191,8 @@ for r_file, c_file in zip(r_peak_files, classification_files):
             'Window_Index': idx,
             'Activity_Class': activity_class,
             'Fuzzy_SQI': quality_val,
-            'Signal_Quality': classification
+            'Signal_Quality': classification,
+            **features.to_dict()
         })
 
     # Remove segment result CSV files
@@ -138,6 +200,11 @@ for r_file, c_file in zip(r_peak_files, classification_files):
         if file.endswith('_results.csv'):
             os.remove(os.path.join(participant_folder, file))
 
+    # Save the per-window results for the analysis and HRV stages
+    sqi_file_path = os.path.join(folder_path, f"{r_file.split('.')[0]}_fuzzy_sqi.csv")
+    with atomic_path(sqi_file_path) as tmp_path:
+        pd.DataFrame(sqi_results).to_csv(tmp_path, index=False)
+
     # Visualization for each participant
     # Histograms: Distribution of Fuzzy SQI across Activity Classes
     plt.figure()
@@ -0,0 +1,204 @@
+import os
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from checkpoint import atomic_path
+
+# Define the paths
+peaks_path = r"C:\Users\Shree\Desktop\Projects\2023-hexoskin-study-data\R-Peak_times_5"
+sqi_path = r"C:\Users\Shree\Desktop\Projects\2023-hexoskin-study-data\Fuzzy_SQI_Results_6"
+output_folder = r"C:\Users\Shree\Desktop\Projects\2023-hexoskin-study-data\HRV_data_8"
+os.makedirs(output_folder, exist_ok=True)
+
+# Define constants
+sampling_rate = 256             # ECG sampling rate of the R-peak indices (Hz)
+window_seconds = 10             # Same 10-second windows as the Fuzzy SQI stage
+rolling_windows = 6             # Rolling HR/HRV over 6 windows (1 minute)
+accepted_quality = ['Excellent', 'Barely Acceptable']   # SQI classes used for HRV
+min_snr_db = 5                  # Spectral SQI a window also needs: QRS power at least ~3x the noise power,
+min_ksqi = 5                    # a peaky (kurtosis above 5) ECG
+min_bassqi = 0.9                # and at most 10% of the power in the baseline-wander band
+min_rr, max_rr = 300, 2000      # Physiological RR range (ms), everything else is an artifact
+
+# Frequency-domain HRV: RR series interpolated at 4 Hz, analysed over rolling 5-minute segments
+resample_rate = 4
+segment_seconds = 300
+min_good_fraction = 0.8         # Share of good windows a segment needs
+lf_band = (0.04, 0.15)
+hf_band = (0.15, 0.4)
+
+# Load the R-peak tables and the per-window signal quality of every participant
+participants = []
+peak_times = []
+good_windows = []
+for file_name in sorted(os.listdir(peaks_path)):
+    if not file_name.endswith('_peaks.csv'):
+        continue
+    participant = file_name[:-len('_peaks.csv')]
+
+    sqi_file = os.path.join(sqi_path, f"{participant}_fuzzy_sqi.csv")
+    if not os.path.exists(sqi_file):
+        print(f"Skipping {participant}: no Fuzzy SQI results")
+        continue
+
+    peaks = pd.read_csv(os.path.join(peaks_path, file_name), usecols=['R-Peak Index'])['R-Peak Index'].values
+    sqi = pd.read_csv(sqi_file, usecols=['Window_Index', 'Signal_Quality', 'SNR_dB', 'kSQI', 'basSQI'])
+
+    # Windows of accepted quality class that also pass the spectral SQI thresholds (NaN fails)
+    good = np.zeros(sqi['Window_Index'].max() + 1 if len(sqi) else 0, dtype=bool)
+    good[sqi['Window_Index'].values] = (sqi['Signal_Quality'].isin(accepted_quality)
+                                        & (sqi['SNR_dB'] >= min_snr_db)
+                                        & (sqi['kSQI'] >= min_ksqi)
+                                        & (sqi['basSQI'] >= min_bassqi)).values
+
+    participants.append(participant)
+    peak_times.append(np.sort(peaks) / sampling_rate)
+    good_windows.append(good)
+
+if not participants:
+    raise SystemExit("No participants with both R-peaks and Fuzzy SQI results")
+
+# Number the windows of all participants one after another, so the statistics of the whole
+# cohort are computed with a single bincount per quantity
+n_windows = np.array([len(good) for good in good_windows])
+window_offset = np.concatenate(([0], np.cumsum(n_windows)[:-1]))
+total_windows = n_windows.sum()
+good_all = np.concatenate(good_windows)
+
+# RR intervals (ms) of participant p, the window in which each interval ends, and whether
+# the interval is physiological and lies in a window of accepted signal quality
+def rr_intervals(p):
+    times = peak_times[p]
+    rr = np.diff(times) * 1000
+    window = (times[1:] // window_seconds).astype(int)
+    inside = window < n_windows[p]
+    valid = inside & (rr >= min_rr) & (rr <= max_rr)
+    valid[inside] &= good_windows[p][window[inside]]
+    return rr, window, valid
+
+rr_all, key_all, diff_all, diff_key_all = [], [], [], []
+for p in range(len(participants)):
+    rr, window, valid = rr_intervals(p)
+    key = window_offset[p] + window
+    rr_all.append(rr[valid])
+    key_all.append(key[valid])
+
+    # Successive differences, only between two valid intervals of the same window
+    both = valid[1:] & valid[:-1] & (window[1:] == window[:-1])
+    diff_all.append(np.diff(rr)[both])
+    diff_key_all.append(key[1:][both])
+
+rr_all = np.concatenate(rr_all)
+key_all = np.concatenate(key_all)
+diff_all = np.concatenate(diff_all)
+diff_key_all = np.concatenate(diff_key_all)
+
+# Per-window sums for the time-domain measures
+sums = {
+    'n': np.bincount(key_all, minlength=total_windows).astype(float),
+    'rr': np.bincount(key_all, weights=rr_all, minlength=total_windows),
+    'rr2': np.bincount(key_all, weights=rr_all ** 2, minlength=total_windows),
+    'n_diff': np.bincount(diff_key_all, minlength=total_windows).astype(float),
+    'diff2': np.bincount(diff_key_all, weights=diff_all ** 2, minlength=total_windows),
+    'nn50': np.bincount(diff_key_all, weights=np.abs(diff_all) > 50, minlength=total_windows),
+}
+
+# Time-domain HRV from the sums of each window (or group of windows)
+def time_domain(s):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_rr = s['rr'] / s['n']
+        sdnn = np.sqrt(np.maximum(s['rr2'] - s['rr'] * mean_rr, 0) / (s['n'] - 1))
+        sdnn[s['n'] < 2] = np.nan
+        rmssd = np.sqrt(s['diff2'] / s['n_diff'])
+        pnn50 = 100 * s['nn50'] / s['n_diff']
+        heart_rate = 60000 / mean_rr
+    return heart_rate, mean_rr, sdnn, rmssd, pnn50
+
+# Rolling sums over the last rolling_windows windows, never reaching into the previous participant
+index = np.arange(total_windows)
+participant_start = np.repeat(window_offset, n_windows)
+rolling_start = np.maximum(index - rolling_windows + 1, participant_start)
+def rolling_sum(values):
+    cumulative = np.concatenate(([0], np.cumsum(values)))
+    return cumulative[index + 1] - cumulative[rolling_start]
+
+window_hrv = time_domain(sums)
+rolling_hrv = time_domain({name: rolling_sum(values) for name, values in sums.items()})
+
+# Frequency-domain HRV: frame every participant's evenly resampled RR series into rolling
+# segments (one per window, as a view), then transform the segments in fixed-size chunks
+# so that the memory stays bounded however long the recordings and the cohort are
+segment_length = segment_seconds * resample_rate
+step = window_seconds * resample_rate
+segment_windows = segment_seconds // window_seconds
+segment_chunk = 256             # Segments transformed at once
+
+# Periodogram with a Hann taper (ms^2/Hz), one-sided
+taper = np.hanning(segment_length)
+freqs = np.fft.rfftfreq(segment_length, d=1 / resample_rate)
+freq_step = freqs[1] - freqs[0]
+lf = (freqs >= lf_band[0]) & (freqs < lf_band[1])
+hf = (freqs >= hf_band[0]) & (freqs < hf_band[1])
+
+lf_power = np.full(total_windows, np.nan)
+hf_power = np.full(total_windows, np.nan)
+for p, times in enumerate(peak_times):
+    rr, window, valid = rr_intervals(p)
+    if valid.sum() < 2 or n_windows[p] < segment_windows:
+        continue
+
+    grid = np.arange(n_windows[p] * step) / resample_rate
+    rr_even = np.interp(grid, times[1:][valid], rr[valid])
+    framed = sliding_window_view(rr_even, segment_length)[::step]
+
+    # Each segment is stored under the last window it covers
+    last_window = np.arange(len(framed)) + segment_windows - 1
+    good_fraction = sliding_window_view(good_windows[p].astype(float), segment_windows).mean(axis=1)
+    keep = np.flatnonzero(good_fraction[:len(framed)] >= min_good_fraction)
+
+    for start in range(0, len(keep), segment_chunk):
+        rows = keep[start:start + segment_chunk]
+        segments = framed[rows]
+        detrended = (segments - segments.mean(axis=1, keepdims=True)) * taper
+        psd = np.abs(np.fft.rfft(detrended, axis=1)) ** 2 / (resample_rate * np.sum(taper ** 2))
+        psd[:, 1:-1] *= 2
+        keys = window_offset[p] + last_window[rows]
+        lf_power[keys] = psd[:, lf].sum(axis=1) * freq_step
+        hf_power[keys] = psd[:, hf].sum(axis=1) * freq_step
+
+# Collect the results of the whole cohort in one table
+hrv = pd.DataFrame({
+    'Participant': np.repeat(participants, n_windows),
+    'Window_Index': index - participant_start,
+    'Start_Time (s)': (index - participant_start) * window_seconds,
+    'Good_Window': good_all,
+    'RR_Intervals': sums['n'].astype(int),     # Valid RR intervals ending in the window
+    'HR (bpm)': window_hrv[0],
+    'Mean_RR (ms)': window_hrv[1],
+    'SDNN (ms)': window_hrv[2],
+    'RMSSD (ms)': window_hrv[3],
+    'pNN50 (%)': window_hrv[4],
+    'Rolling_HR (bpm)': rolling_hrv[0],
+    'Rolling_SDNN (ms)': rolling_hrv[2],
+    'Rolling_RMSSD (ms)': rolling_hrv[3],
+    'Rolling_pNN50 (%)': rolling_hrv[4],
+    'LF (ms2)': lf_power,
+    'HF (ms2)': hf_power,
+})
+with np.errstate(divide='ignore', invalid='ignore'):
+    hrv['LF/HF'] = lf_power / hf_power
+
+# Save one file per participant and a cohort summary of the good windows
+for participant, participant_hrv in hrv.groupby('Participant', sort=False):
+    output_file = os.path.join(output_folder, f"{participant}_hrv.csv")
+    with atomic_path(output_file) as tmp_path:
+        participant_hrv.to_csv(tmp_path, index=False)
+
+summary = hrv[hrv['Good_Window']].groupby('Participant').median(numeric_only=True)
+summary = summary.drop(columns=['Window_Index', 'Start_Time (s)', 'Good_Window'])
+summary.insert(0, 'Good_Windows', hrv.groupby('Participant')['Good_Window'].sum())
+summary_file = os.path.join(output_folder, "hrv_summary.csv")
+with atomic_path(summary_file) as tmp_path:
+    summary.to_csv(tmp_path)
+
+print(f"HRV of {len(participants)} participants saved in: {output_folder}")
@@ -3,11 +3,13 @@ import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import neurokit2 as nk
+from checkpoint import Ledger, atomic_path, file_size_estimate, folder_source
 
 # Define the paths
-filePath = r"C:\Users\Shree\Desktop\Projects\2023-hexoskin-study-data\synchronizing_Data_2"
+filePath = r"C:\Users\Shree\Desktop\Projects\2023-hexoskin-study-data\cleaning_Data_3"  # Cleaned ECG written by cleaning_3.py
 output_Path = r"C:\Users\Shree\Desktop\Projects\2023-hexoskin-study-data\R-Peak_data_5"
 plot_Path = r'C:\Users\Shree\Desktop\Projects\2023-hexoskin-study-data\R_peak_plots_5'
+peaks_Path = r"C:\Users\Shree\Desktop\Projects\2023-hexoskin-study-data\R-Peak_times_5"  # Compact R-peak tables for HRV_8.py
 
 # Get the list of files
 fileNames = [f for f in os.listdir(filePath)]
@@ -16,18 +18,25 @@ fileList = fileNames[:150]  # Limit to the first 150 files
 # Ensure output directories exist
 os.makedirs(output_Path, exist_ok=True)
 os.makedirs(plot_Path, exist_ok=True)
+os.makedirs(peaks_Path, exist_ok=True)
+
+# Continue from the last run (False starts over from the first file)
+resume = True
 
 # Define constants
 sampling_rate = 256  # Adjust the sampling rate if needed
 window_size = 10 * sampling_rate  # 10-second window size
 
+ledger = Ledger('R-Peak_5', resume=resume, source=folder_source(filePath))
+
 # Process each file
-for fileName in fileList:
+for fileName in ledger.pending(fileList, file_size_estimate(filePath)):
     print(f"Checking file: {fileName}")
     
     # Skip files that don't contain ECG data or are classification files
     if not fileName.endswith('.csv') or 'Window ID' in fileName or 'Total Activity' in fileName or 'Activity Class' in fileName:
         print(f"Skipping {fileName}")
+        ledger.mark_skipped(fileName, "not an ECG file")
         continue
 
     try:
@@ -43,6 +52,7 @@ for fileName in fileList:
            ecg_signal = pd.to_numeric(ecg_data['ECG'], errors='coerce').dropna()
         else:
             print(f"ECG signal column not found in {fileName}")
+            ledger.mark_skipped(fileName, "ECG column not found")
             continue  # Skip this file if the ECG column is not found
 
         # Detect R-peaks using NeuroKit2
@@ -63,8 +73,14 @@ for fileName in fileList:
         ecg_data['R-Peak Value'] = pd.Series([ecg_signal[i] if i in r_peaks else None for i in range(len(ecg_signal))])
 
         # Save the results to a new CSV file
+        # Save the R-peak table on its own so HRV can be computed without reloading the ECG
+        peaks_file_path = os.path.join(peaks_Path, f"{os.path.splitext(fileName)[0]}_peaks.csv")
+        with atomic_path(peaks_file_path) as tmp_path:
+            r_peak_data.to_csv(tmp_path, index=False)
+
         output_file_path = os.path.join(output_Path, fileName)
-        ecg_data.to_csv(output_file_path, index=False)
+        with atomic_path(output_file_path) as tmp_path:
+            ecg_data.to_csv(tmp_path, index=False)
 
         # Create a folder for the plots for this file
         file_plot_path = os.path.join(plot_Path, os.path.splitext(fileName)[0])
@@ -114,7 +130,10 @@ for fileName in fileList:
             plt.savefig(plot_file_path)
             plt.close()
 
+        ledger.mark_done(fileName, [peaks_file_path, output_file_path])
         print(f"Processed and saved: {fileName}")
 
     except Exception as e:
+        plt.close('all')
+        ledger.mark_failed(fileName, e)
         print(f"Error processing {fileName}: {e}")
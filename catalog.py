@@ -0,0 +1,261 @@
+import os
+import re
+import json
+import numpy as np
+from datetime import datetime, timedelta
+from checkpoint import atomic_path
+
+# Define the paths
+edf_dir_path = r"C:\Users\Shree\Desktop\Projects\2023-hexoskin-study-data\hexoskin"  # Directory containing EDF files
+catalog_path = r"C:\Users\Shree\Desktop\Projects\2023-hexoskin-study-data\catalog.json"  # Persistent recording index
+
+# Version of the catalog entries; a catalog saved with another version is rebuilt from scratch
+catalog_version = 5
+
+# File names as documented in the README: 'HX45123.edf' for a single record,
+# 'HX45123-{index}_{HH}{MM}{ss}_{MM}{ss}.edf' (or '..._{HH}{MM}{ss}.edf' for long records) otherwise
+file_name_pattern = re.compile(
+    r'^(?P<device>HX\d+A?)(?:-(?P<index>\d+)_(?P<start>\d{6})_(?P<duration>\d{4}|\d{6}))?\.edf$'
+)
+
+# Documented exceptions
+renamed_devices = {'HX45249A': 'HX45249'}                 # The real HX45249, renamed because its ID is used twice
+ambiguous_devices = {                                     # Nonexistent or mis-transcribed IDs of an unknown device:
+    'HX4516': ['HX45136', 'HX45163'],                     # one of these devices
+    'HX45249': [],                                        # not the real HX45249 (now HX45249A), device unknown
+}
+
+# Parse device ID, segment index, start time of day and duration from a file name
+def parse_file_name(filename):
+    match = file_name_pattern.match(filename)
+    if match is None:
+        return None
+
+    info = {'device': match['device'], 'segment_index': None, 'file_start': None, 'file_duration_s': None}
+    if match['index'] is not None:
+        start = match['start']
+        duration = match['duration']
+        info['segment_index'] = int(match['index'])
+        info['file_start'] = f"{start[0:2]}:{start[2:4]}:{start[4:6]}"
+        if len(duration) == 4:
+            info['file_duration_s'] = int(duration[0:2]) * 60 + int(duration[2:4])
+        else:
+            info['file_duration_s'] = int(duration[0:2]) * 3600 + int(duration[2:4]) * 60 + int(duration[4:6])
+    return info
+
+# Read the fixed-size ASCII header of an EDF file (no signal data is read)
+def read_edf_header(file_path):
+    with open(file_path, 'rb') as f:
+        header = f.read(256).decode('ascii', errors='replace')
+        num_signals = int(header[252:256])
+        signal_header = f.read(num_signals * 256).decode('latin-1')  # Units may hold a micro sign
+
+    # Signal header fields are stored field by field for all signals
+    def fields(offset, width):
+        start = offset * num_signals
+        return [signal_header[start + i * width:start + (i + 1) * width].strip() for i in range(num_signals)]
+
+    labels = fields(0, 16)
+    units = fields(96, 8)
+    physical_min = fields(104, 8)
+    physical_max = fields(112, 8)
+    digital_min = fields(120, 8)
+    digital_max = fields(128, 8)
+    samples_per_record = fields(216, 8)
+
+    # Start date is dd.mm.yy, years 85-99 are 1985-1999 (EDF specification)
+    day, month, year = (int(v) for v in header[168:176].split('.'))
+    hour, minute, second = (int(v) for v in header[176:184].split('.'))
+    year += 1900 if year >= 85 else 2000
+
+    header_bytes = int(header[184:192])
+    edf_type = header[192:197].strip()      # 'EDF+C' (continuous), 'EDF+D' (discontinuous) or '' (EDF)
+    num_records = int(header[236:244])
+    record_duration = float(header[244:252])
+
+    # -1 records means the recorder did not finish the header; count them from the file size
+    if num_records < 0:
+        record_bytes = 2 * sum(int(samples) for samples in samples_per_record)
+        num_records = (os.path.getsize(file_path) - header_bytes) // record_bytes
+
+    channels = []
+    for i in range(num_signals):
+        samples = int(samples_per_record[i])
+        channels.append({
+            'label': labels[i],
+            'unit': units[i],
+            'sfreq': samples / record_duration if record_duration else None,
+            'n_samples': samples * num_records,
+            'samples_per_record': samples,
+            'physical_min': float(physical_min[i]),
+            'physical_max': float(physical_max[i]),
+            'digital_min': int(digital_min[i]),
+            'digital_max': int(digital_max[i]),
+        })
+
+    return {
+        'start_time': datetime(year, month, day, hour, minute, second).isoformat(),
+        'duration_s': num_records * record_duration,
+        'edf_type': edf_type,
+        'header_bytes': header_bytes,
+        'n_records': num_records,
+        'record_duration': record_duration,
+        'channels': channels,
+    }
+
+# Catalog entry of one EDF file: file name information, header and documented exceptions
+def catalog_entry(edf_dir, filename):
+    file_path = os.path.join(edf_dir, filename)
+    stat = os.stat(file_path)
+    entry = {'mtime': stat.st_mtime, 'size': stat.st_size, 'notes': []}
+
+    name_info = parse_file_name(filename)
+    if name_info is None:
+        entry['device'] = None
+        entry['notes'].append("file name does not follow the naming scheme")
+    else:
+        entry.update(name_info)
+        device = name_info['device']
+        if device in renamed_devices:
+            entry['notes'].append(f"the real {renamed_devices[device]}, renamed because {renamed_devices[device]} "
+                                  f"is also the mis-transcribed ID of another device")
+        if device in ambiguous_devices:
+            entry['unknown_device'] = True
+            entry['candidates'] = ambiguous_devices[device]
+            if ambiguous_devices[device]:
+                entry['notes'].append(f"device does not exist, either {' or '.join(ambiguous_devices[device])}")
+            else:
+                entry['notes'].append(f"transcription error: {device} is the ID of an unknown device, "
+                                      f"not the real {device} ({', '.join(k for k, v in renamed_devices.items() if v == device)})")
+
+    try:
+        entry.update(read_edf_header(file_path))
+
+        # The records of an EDF+D file are not contiguous: the file spans from the start time to
+        # the end of its last record, and every jump between records is a discontinuity
+        # [time in the recording (s), skipped time (s)]
+        entry['span_s'] = entry['duration_s']
+        entry['discontinuities'] = []
+        if entry['edf_type'] == 'EDF+D':
+            onsets = record_onsets(file_path, entry)
+            if onsets:
+                record_duration = entry['record_duration']
+                entry['span_s'] = onsets[-1] + record_duration
+                steps = np.diff(onsets)
+                for record in np.flatnonzero(steps > record_duration + 1e-3):
+                    entry['discontinuities'].append([float((record + 1) * record_duration), float(steps[record] - record_duration)])
+    except (ValueError, UnicodeDecodeError, OSError, ZeroDivisionError) as e:
+        entry['error'] = f"unreadable EDF header: {e}"
+        return entry
+
+    # Cross-check the file name against the header
+    if entry.get('file_start') and not entry['start_time'].endswith(entry['file_start']):
+        entry['notes'].append(f"file name start {entry['file_start']} differs from header start {entry['start_time']}")
+    if entry.get('file_duration_s') is not None and abs(entry['file_duration_s'] - entry['span_s']) > 1:
+        entry['notes'].append(f"file name duration {entry['file_duration_s']} s differs from header duration {entry['span_s']} s")
+    return entry
+
+# Build or update the catalog; headers are only re-read for new or changed files
+def build_catalog(edf_dir=edf_dir_path, path=catalog_path):
+    catalog = load_catalog(path)
+    if catalog.get('version') != catalog_version:
+        catalog = {'files': {}, 'devices': {}}
+    files = {}
+    for filename in sorted(os.listdir(edf_dir)):
+        if not filename.endswith(".edf"):
+            print(f"Skipping non-EDF file: {filename}")
+            continue
+        cached = catalog['files'].get(filename)
+        stat = os.stat(os.path.join(edf_dir, filename))
+        if cached is not None and cached['mtime'] == stat.st_mtime and cached['size'] == stat.st_size:
+            files[filename] = cached
+        else:
+            files[filename] = catalog_entry(edf_dir, filename)
+
+    # Device -> segments ordered by segment index, then start time
+    devices = {}
+    for filename, entry in files.items():
+        if entry.get('device') is not None:
+            devices.setdefault(entry['device'], []).append(filename)
+    for device, segments in devices.items():
+        segments.sort(key=lambda f: (files[f]['segment_index'] or 0, files[f].get('start_time') or ''))
+
+    catalog = {'version': catalog_version, 'files': files, 'devices': dict(sorted(devices.items()))}
+    save_catalog(catalog, path)
+    return catalog
+
+def load_catalog(path=catalog_path):
+    if not os.path.exists(path):
+        return {'files': {}, 'devices': {}}
+    with open(path) as f:
+        return json.load(f)
+
+def save_catalog(catalog, path=catalog_path):
+    with atomic_path(path) as tmp_path:
+        with open(tmp_path, 'w') as f:
+            json.dump(catalog, f, indent=2)
+
+# Onsets (s) of the data records of an EDF+ file, from the time-keeping annotation that starts
+# the 'EDF Annotations' signal of every record; only that signal is read
+def record_onsets(file_path, entry):
+    labels = [channel['label'] for channel in entry['channels']]
+    if 'EDF Annotations' not in labels:
+        return None
+    sizes = [2 * channel['samples_per_record'] for channel in entry['channels']]
+    annotations = labels.index('EDF Annotations')
+    offset = entry['header_bytes'] + sum(sizes[:annotations])
+
+    onsets = []
+    with open(file_path, 'rb') as f:
+        for record in range(entry['n_records']):
+            f.seek(offset + record * sum(sizes))
+            tal = f.read(sizes[annotations])
+            onsets.append(float(tal.split(b'\x14', 1)[0].decode('ascii')))
+    return onsets
+
+# Native digital samples of every channel, memory-mapped: one (records x samples per record)
+# int16 view per channel label, read from the file only when sliced
+def channel_records(file_path, entry):
+    sizes = [channel['samples_per_record'] for channel in entry['channels']]
+    n_records = min(entry['n_records'], (os.path.getsize(file_path) - entry['header_bytes']) // (2 * sum(sizes)))
+    if n_records > 0:
+        data = np.memmap(file_path, dtype='<i2', mode='r', offset=entry['header_bytes'], shape=(n_records, sum(sizes)))
+    else:
+        data = np.empty((0, sum(sizes)), dtype='<i2')
+    offsets = np.concatenate(([0], np.cumsum(sizes)))
+    return {channel['label']: data[:, offsets[i]:offsets[i + 1]] for i, channel in enumerate(entry['channels'])}
+
+# Ordered segments of one device with their start and end times
+def device_segments(catalog, device):
+    segments = []
+    for filename in catalog['devices'].get(device, []):
+        entry = catalog['files'][filename]
+        if 'error' in entry:
+            continue
+        start = datetime.fromisoformat(entry['start_time'])
+        segments.append((filename, start, start + timedelta(seconds=entry.get('span_s', entry['duration_s']))))
+    return segments
+
+# Memory needed to load an EDF file with MNE: every channel is brought to the highest
+# sampling rate and held as 64-bit floats
+def estimate_memory(entry):
+    if 'error' in entry or not entry['channels']:
+        return entry['size'] * 8
+    max_sfreq = max(channel['sfreq'] or 0 for channel in entry['channels'])
+    return int(len(entry['channels']) * max_sfreq * entry['duration_s'] * 8)
+
+
+if __name__ == "__main__":
+    catalog = build_catalog()
+    for device, segments in catalog['devices'].items():
+        print(f"{device}: {len(segments)} segment(s)")
+        for filename in segments:
+            entry = catalog['files'][filename]
+            if 'error' in entry:
+                print(f"  {filename}: {entry['error']}")
+                continue
+            print(f"  {filename}: start {entry['start_time']}, {entry['duration_s']:.0f} s, "
+                  f"{len(entry['channels'])} channels, ~{estimate_memory(entry) / 1e9:.2f} GB")
+            for note in entry['notes']:
+                print(f"    note: {note}")
+    print(f"Catalog saved to: {catalog_path}")
@@ -0,0 +1,180 @@
+import os
+import gc
+import json
+from contextlib import contextmanager
+from datetime import datetime
+
+# psutil is optional; without it the memory check before a retry is skipped
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Folder holding one checkpoint ledger per stage
+checkpoint_dir_path = r"C:\Users\Shree\Desktop\Projects\2023-hexoskin-study-data\checkpoints"
+
+# Number of times a file is tried (over all runs) before it is left alone
+max_attempts = 3
+
+
+# Write a file atomically: the caller writes to a temporary '.part' file next to the target,
+# which replaces the target only when the block finishes without an error. A crash never
+# leaves a half-written file under the final name for the next stage to pick up.
+@contextmanager
+def atomic_path(path):
+    tmp_path = f"{path}.part"
+    try:
+        yield tmp_path
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+# Available memory in bytes, or None if it cannot be determined
+def available_memory():
+    if psutil is None:
+        return None
+    return psutil.virtual_memory().available
+
+
+# Estimate for Ledger.pending(): the memory needed for a file is roughly its size on disk
+def file_size_estimate(folder):
+    return lambda name: os.path.getsize(os.path.join(folder, name))
+
+# Source for Ledger: the input of each name is the file of that name in the folder
+def folder_source(folder):
+    return lambda name: os.path.join(folder, name)
+
+# Modification time and size of an input file, or None if it does not exist; a list of paths
+# gives a list of fingerprints
+def fingerprint(path):
+    if isinstance(path, (list, tuple)):
+        return [fingerprint(p) for p in path]
+    if not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return {'mtime': stat.st_mtime, 'size': stat.st_size}
+
+
+# Per-stage record of which files are done, skipped or failed. With a source (source(name) is
+# the path, or list of paths, of the input files of a name), each entry keeps the modification time and size of
+# its input, and a name whose input changed is processed again.
+class Ledger:
+    def __init__(self, stage, resume=True, source=None, checkpoint_dir=checkpoint_dir_path):
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        self.path = os.path.join(checkpoint_dir, f"{stage}.json")
+        self.source = source
+        self.entries = {}
+        self.tried = set()      # Names started in this run
+        if resume and os.path.exists(self.path):
+            with open(self.path) as f:
+                self.entries = json.load(f)
+
+        # A file still marked as running was interrupted, most likely because the process was
+        # killed for running out of memory; retry it like a file that raised MemoryError
+        for entry in self.entries.values():
+            if entry['status'] == 'running':
+                entry['status'] = 'failed'
+                entry['error_type'] = 'Interrupted'
+        self.save()
+
+    def save(self):
+        with atomic_path(self.path) as tmp_path:
+            with open(tmp_path, 'w') as f:
+                json.dump(self.entries, f, indent=2)
+
+    def update(self, name, status, error=None, error_type=None):
+        entry = self.entries.get(name, {'attempts': 0})
+        entry['status'] = status
+        if self.source is not None and name not in self.tried:
+            entry['input'] = fingerprint(self.source(name))
+        entry['error'] = error
+        entry['error_type'] = error_type
+        entry['updated'] = datetime.now().isoformat(timespec='seconds')
+        self.entries[name] = entry
+        self.save()
+
+    # outputs: files the stage wrote for this name; the name is processed again if one goes missing
+    def mark_done(self, name, outputs=None):
+        self.entries.setdefault(name, {'attempts': 0})['outputs'] = list(outputs or [])
+        self.update(name, 'done')
+
+    def mark_skipped(self, name, reason):
+        self.update(name, 'skipped', error=reason)
+
+    def mark_failed(self, name, error):
+        self.update(name, 'failed', error=str(error), error_type=type(error).__name__)
+
+    def status(self, name):
+        return self.entries.get(name, {}).get('status')
+
+    def attempts(self, name):
+        return self.entries.get(name, {}).get('attempts', 0)
+
+    def out_of_memory(self, name):
+        return self.entries.get(name, {}).get('error_type') in ('MemoryError', 'Interrupted')
+
+    def start(self, name):
+        entry = self.entries.get(name, {'attempts': 0})
+        entry['attempts'] += 1
+        entry['status'] = 'running'
+        if self.source is not None:
+            entry['input'] = fingerprint(self.source(name))
+        self.entries[name] = entry
+        self.tried.add(name)
+        self.save()
+
+    # Forget the entries whose input changed since it was processed (or was never fingerprinted)
+    # or whose outputs are missing, so that they are processed again from scratch
+    def forget_stale(self, names):
+        for name in names:
+            entry = self.entries.get(name)
+            if entry is None:
+                continue
+            changed = self.source is not None and entry.get('input') != fingerprint(self.source(name))
+            missing = entry['status'] == 'done' and not all(os.path.exists(path) for path in entry.get('outputs', []))
+            if changed or missing:
+                print(f"Reprocessing {name}: {'input changed' if changed else 'output missing'}")
+                del self.entries[name]
+        self.save()
+
+    # Yield the files that still need processing. Files never tried come first, in the given
+    # order, then files that failed in an earlier run. Files that ran out of memory in an earlier
+    # run are retried last, smallest first, after freeing memory, and only if their estimated
+    # memory need (estimate(name) in bytes) fits in the memory currently available. A file that
+    # runs out of memory is not retried in the same run, where the conditions are unchanged.
+    def pending(self, names, estimate=None):
+        names = list(names)
+        self.forget_stale(names)
+        fresh = [name for name in names if self.status(name) is None]
+        failed = [name for name in names if self.status(name) == 'failed' and not self.out_of_memory(name)]
+
+        for name in fresh + failed:
+            if self.attempts(name) >= max_attempts:
+                print(f"Giving up on {name} after {self.attempts(name)} attempts")
+                continue
+            self.start(name)
+            yield name
+
+        deferred = set()
+        while True:
+            retry = [name for name in names
+                     if self.status(name) == 'failed' and self.out_of_memory(name)
+                     and self.attempts(name) < max_attempts and name not in deferred and name not in self.tried]
+            if not retry:
+                break
+            if estimate is not None:
+                retry.sort(key=estimate)
+            name = retry[0]
+
+            gc.collect()
+            available = available_memory()
+            if estimate is not None and available is not None and estimate(name) > available:
+                print(f"Deferring {name}: needs about {estimate(name) / 1e9:.1f} GB, {available / 1e9:.1f} GB available")
+                deferred.add(name)
+                continue
+
+            print(f"Retrying {name} after running out of memory")
+            self.start(name)
+            yield name
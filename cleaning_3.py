@@ -2,7 +2,9 @@ import os
 import numpy as np
 import pandas as pd
 from scipy.signal import butter, filtfilt
+from numpy.lib.stride_tricks import sliding_window_view
 import matplotlib.pyplot as plt
+from checkpoint import Ledger, atomic_path, file_size_estimate, folder_source
 
 # Input folder containing ECG and synchronized accelerometer data
 input_folder = r"C:\Users\Shree\Desktop\Projects\2023-hexoskin-study-data\synchronizing_Data_2"
@@ -11,16 +13,25 @@ input_folder = r"C:\Users\Shree\Desktop\Projects\2023-hexoskin-study-data\synchr
 output_folder = r"C:\Users\Shree\Desktop\Projects\2023-hexoskin-study-data\cleaning_Data_3"
 os.makedirs(output_folder, exist_ok=True)  # Create the folder if it doesn't exist
 
+# Output folder for the per-window motion-artifact reports
+report_folder = r"C:\Users\Shree\Desktop\Projects\2023-hexoskin-study-data\cleaning_reports_3"
+os.makedirs(report_folder, exist_ok=True)
+
+# Continue from the last run (False starts over from the first file)
+resume = True
+
+# Columns written by synchronizing_2.py
+ecg_column = 'ECG'
+accel_columns = ['Accel_X', 'Accel_Y', 'Accel_Z']
+
 # Function to load data from a file (modify if the format is different)
 def load_data(file_path):
-    # Use pandas to load the data, skipping the header and selecting only numeric columns
-    data = pd.read_csv(file_path)  # Read the CSV file
-    # Select only numeric columns (ignores headers and any non-numeric data like 'Timestamp')
-    numeric_data = data.select_dtypes(include=[np.number]).values
-    return numeric_data
-
-# Butterworth bandpass filter design
-def bandpass_filter(signal, lowcut, highcut, fs=250):
+    # Select the ECG and accelerometer columns by name
+    data = pd.read_csv(file_path, usecols=['Timestamp', ecg_column] + accel_columns)
+    return data
+
+# Butterworth bandpass filter design (filters along the last axis)
+def bandpass_filter(signal, lowcut, highcut, fs=256):
     # Calculate the Nyquist frequency
     nyquist = 0.5 * fs  # Nyquist frequency is half of the sampling rate
 
@@ -37,67 +48,126 @@ def bandpass_filter(signal, lowcut, highcut, fs=250):
     filtered_signal = filtfilt(b, a, signal)
     return filtered_signal
 
+# Adaptive noise cancellation with the accelerometer axes as the noise reference.
+# Block normalized LMS: the reference taps of a whole block form one matrix, the motion
+# artifact of the block is estimated with one matrix product, and the weights are updated
+# once per block.
+def adaptive_noise_cancel(ecg, reference, taps=16, block_size=256, step_size=0.5):
+    num_samples, num_axes = reference.shape
+
+    # Tap-delay view of the reference: row i holds the last `taps` samples of every axis
+    padded = np.vstack((np.zeros((taps - 1, num_axes)), reference))
+    delayed = sliding_window_view(padded, taps, axis=0)  # samples x axes x taps (no copy)
+
+    weights = np.zeros(num_axes * taps)
+    artifact = np.empty(num_samples)
+    for start in range(0, num_samples, block_size):
+        end = min(start + block_size, num_samples)
+        x = delayed[start:end].reshape(end - start, -1)
+        y = x @ weights
+        error = ecg[start:end] - y
+        weights += step_size * (x.T @ error) / (np.sum(x ** 2) + 1e-12)
+        artifact[start:end] = y
+
+    return ecg - artifact, artifact
+
+# Power of the ECG and of the removed artifact in every full window
+def artifact_report(ecg, artifact, window_size):
+    num_windows = len(ecg) // window_size
+    ecg_windows = ecg[:num_windows * window_size].reshape(num_windows, window_size)
+    artifact_windows = artifact[:num_windows * window_size].reshape(num_windows, window_size)
+    ecg_power = np.mean(ecg_windows ** 2, axis=1)
+    artifact_power = np.mean(artifact_windows ** 2, axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return pd.DataFrame({
+            'Window ID': [f"Window-{i+1}" for i in range(num_windows)],
+            'ECG Power': ecg_power,
+            'Artifact Power': artifact_power,
+            'Artifact Removed (%)': 100 * artifact_power / ecg_power,
+        })
+
 # Parameters for filtering
+sampling_rate = 256  # Sampling rate of the synchronized data in Hz
 lowcut = 0.5  # Lower cutoff frequency in Hz
 highcut = 45  # Upper cutoff frequency in Hz
+window_size = 10 * sampling_rate  # 10-second windows for the artifact report
+
+ledger = Ledger('cleaning_3', resume=resume, source=folder_source(input_folder))
+input_files = [f for f in os.listdir(input_folder) if f.endswith(".txt") or f.endswith(".csv")]  # Adjust extensions as needed
 
 # Process files in the input folder
-for filename in os.listdir(input_folder):
-    if filename.endswith(".txt") or filename.endswith(".csv"):  # Adjust extensions as needed
-        file_path = os.path.join(input_folder, filename)
-        print(f"Processing file: {filename}")
-
-        try:
-            # Load the data (assuming ECG is the first column, accelerometer follows)
-            data = load_data(file_path)
-            ecg_signal = data[:, 0]  # ECG data
-            accelerometer_data = data[:, 1:]  # Accelerometer data (multi-column)
-
-            # Apply the bandpass filter to the ECG signal
-            filtered_ecg = bandpass_filter(ecg_signal, lowcut, highcut)
-
-            # Combine ECG and accelerometer data for the entire dataset
-            combined_data = np.column_stack((filtered_ecg, accelerometer_data))
-
-            # Save the entire cleaned data into one CSV file
-            output_file = os.path.join(output_folder, f"cleaned_{filename}")
-            np.savetxt(output_file, combined_data, delimiter=',')
-            print(f"Data saved to: {output_file}")
-
-            # Plot cleaned ECG and accelerometer data for inspection
-            time = np.linspace(0, len(filtered_ecg) / 250, len(filtered_ecg))  # Assuming fs = 250 Hz
-
-            # Plot ECG and accelerometer data
-            plt.figure(figsize=(12, 8))
-
-            # Plot ECG data
-            plt.subplot(2, 1, 1)
-            plt.plot(time, filtered_ecg, label="Cleaned ECG Signal", color="blue")
-            plt.title(f"Cleaned ECG Signal - {filename}")
-            plt.xlabel("Time (s)")
-            plt.ylabel("Amplitude")
-            plt.legend()
-            plt.grid()
-
-            # Plot accelerometer data
-            plt.subplot(2, 1, 2)
-            for i in range(accelerometer_data.shape[1]):
-                plt.plot(time, accelerometer_data[:, i], label=f"Accelerometer Axis {i + 1}")
-            plt.title(f"Accelerometer Data - {filename}")
-            plt.xlabel("Time (s)")
-            plt.ylabel("Amplitude")
-            plt.legend()
-            plt.grid()
-
-            plt.tight_layout()
-
-            # Save the plot as a PNG image in the output folder
-            plot_file = os.path.join(output_folder, f"plot_{filename.split('.')[0]}.png")
-            plt.savefig(plot_file)
-            print(f"Plot saved to: {plot_file}")
-
-            # Close the plot to avoid overlapping with the next one
-            plt.close()
-
-        except Exception as e:
-            print(f"Error processing file {filename}: {e}")
+for filename in ledger.pending(input_files, file_size_estimate(input_folder)):
+    file_path = os.path.join(input_folder, filename)
+    print(f"Processing file: {filename}")
+
+    try:
+        # Load the data
+        data = load_data(file_path)
+        ecg_signal = data[ecg_column].values  # ECG data
+        accelerometer_data = data[accel_columns].values  # Accelerometer data (multi-column)
+
+        # Apply the bandpass filter to the ECG signal
+        filtered_ecg = bandpass_filter(ecg_signal, lowcut, highcut, fs=sampling_rate)
+
+        # Remove the motion artifact that is correlated with the (band-passed, gravity-free)
+        # accelerometer axes
+        reference = bandpass_filter(accelerometer_data.T, lowcut, highcut, fs=sampling_rate).T
+        filtered_ecg, artifact = adaptive_noise_cancel(filtered_ecg, reference)
+
+        # Combine ECG and accelerometer data for the entire dataset
+        cleaned_data = data.copy()
+        cleaned_data[ecg_column] = filtered_ecg
+        cleaned_data['Accel_Magnitude'] = np.sqrt(np.sum(accelerometer_data ** 2, axis=1))
+
+        # Save the entire cleaned data into one CSV file
+        output_file = os.path.join(output_folder, f"cleaned_{filename}")
+        with atomic_path(output_file) as tmp_path:
+            cleaned_data.to_csv(tmp_path, index=False)
+        print(f"Data saved to: {output_file}")
+
+        # Save how much artifact power was removed in each window
+        report_file = os.path.join(report_folder, f"artifact_report_{filename}")
+        with atomic_path(report_file) as tmp_path:
+            artifact_report(filtered_ecg + artifact, artifact, window_size).to_csv(tmp_path, index=False)
+        print(f"Artifact report saved to: {report_file}")
+
+        # Plot cleaned ECG and accelerometer data for inspection
+        time = np.linspace(0, len(filtered_ecg) / sampling_rate, len(filtered_ecg))
+
+        # Plot ECG and accelerometer data
+        plt.figure(figsize=(12, 8))
+
+        # Plot ECG data
+        plt.subplot(2, 1, 1)
+        plt.plot(time, filtered_ecg, label="Cleaned ECG Signal", color="blue")
+        plt.title(f"Cleaned ECG Signal - {filename}")
+        plt.xlabel("Time (s)")
+        plt.ylabel("Amplitude")
+        plt.legend()
+        plt.grid()
+
+        # Plot accelerometer data
+        plt.subplot(2, 1, 2)
+        for i in range(accelerometer_data.shape[1]):
+            plt.plot(time, accelerometer_data[:, i], label=accel_columns[i])
+        plt.title(f"Accelerometer Data - {filename}")
+        plt.xlabel("Time (s)")
+        plt.ylabel("Amplitude")
+        plt.legend()
+        plt.grid()
+
+        plt.tight_layout()
+
+        # Save the plot as a PNG image in the output folder
+        plot_file = os.path.join(output_folder, f"plot_{filename.split('.')[0]}.png")
+        plt.savefig(plot_file)
+        print(f"Plot saved to: {plot_file}")
+
+        # Close the plot to avoid overlapping with the next one
+        plt.close()
+
+        ledger.mark_done(filename, [output_file, report_file, plot_file])
+    except Exception as e:
+        plt.close('all')
+        ledger.mark_failed(filename, e)
+        print(f"Error processing file {filename}: {e}")
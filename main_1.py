@@ -1,44 +1,90 @@
 import os
+import json
 import mne
+import numpy as np
 import pandas as pd
+from checkpoint import Ledger, atomic_path, folder_source
+import catalog
 # import sync
 
 # Define the paths
 edf_dir_path = r"C:\Users\Shree\Desktop\Projects\2023-hexoskin-study-data\hexoskin"  # Directory containing EDF files
 csv_dir_path = r"C:\Users\Shree\Desktop\Projects\2023-hexoskin-study-data\overall"  # Directory to save CSV files
+index_dir_path = r"C:\Users\Shree\Desktop\Projects\2023-hexoskin-study-data\overall_index"  # Directory to save binary signals for queries
 
-# Ensure the CSV directory exists
+# Continue from the last run (False starts over from the first file)
+resume = True
+
+# Ensure the CSV and index directories exist
 os.makedirs(csv_dir_path, exist_ok=True)
+os.makedirs(index_dir_path, exist_ok=True)
+
+# Index the EDF headers and collect the EDF files, device by device in segment order
+recordings = catalog.build_catalog(edf_dir_path)
+edf_files = [filename for segments in recordings['devices'].values() for filename in segments]
+edf_files += [filename for filename, entry in recordings['files'].items() if entry['device'] is None]
+
+# Memory needed to convert an EDF file: the loaded signals, held both as the array
+# and as the DataFrame
+def estimate_memory(filename):
+    return catalog.estimate_memory(recordings['files'][filename]) * 2
 
-# Iterate over files in the EDF directory
-for filename in os.listdir(edf_dir_path):
+ledger = Ledger('main_1', resume=resume, source=folder_source(edf_dir_path))
+
+# Files whose EDF header cannot be read are not loaded
+for filename, entry in recordings['files'].items():
+    if 'error' in entry and ledger.status(filename) is None:
+        print(f"Skipping {filename}: {entry['error']}")
+        ledger.mark_skipped(filename, entry['error'])
+
+# Iterate over the EDF files that are not converted yet
+for filename in ledger.pending(edf_files, estimate_memory):
     file_path = os.path.join(edf_dir_path, filename)
 
-    # Check if the file is an EDF file
-    if file_path.endswith(".edf"):
-        try:
-            # Load the EDF file
-            raw = mne.io.read_raw_edf(file_path, preload=True)
-
-            # Extract data and metadata
-            data = raw.get_data()               # Get signals
-            times = raw.times                   # Get timestamps
-            channel_names = raw.ch_names        # Get channel names
-
-            # Check for shape consistency
-            if data.shape[0] != len(channel_names):
-                raise ValueError("Mismatch between data and channel names")
-
-            # Create a DataFrame
-            df = pd.DataFrame(data.T, columns=channel_names)  # Transpose data for proper format
-            df['Time (s)'] = times                           # Add timestamps
-
-            # Save DataFrame to CSV
-            csv_file_path = os.path.join(csv_dir_path, f"{os.path.splitext(filename)[0]}.csv")
-            df.to_csv(csv_file_path, index=False)
-
-            print(f"EDF data from {filename} has been successfully saved to {csv_file_path}")
-        except Exception as e:
-            print(f"An error occurred while processing the file {filename}: {e}")
-    else:
-        print(f"Skipping non-EDF file: {filename}")
+    try:
+        # Load the EDF file
+        raw = mne.io.read_raw_edf(file_path, preload=True)
+
+        # Extract data and metadata
+        data = raw.get_data()               # Get signals
+        times = raw.times                   # Get timestamps
+        channel_names = raw.ch_names        # Get channel names
+
+        # Check for shape consistency
+        if data.shape[0] != len(channel_names):
+            raise ValueError("Mismatch between data and channel names")
+
+        # Create a DataFrame
+        df = pd.DataFrame(data.T, columns=channel_names)  # Transpose data for proper format
+        df['Time (s)'] = times                           # Add timestamps
+
+        # Save DataFrame to CSV
+        csv_file_path = os.path.join(csv_dir_path, f"{os.path.splitext(filename)[0]}.csv")
+        with atomic_path(csv_file_path) as tmp_path:
+            df.to_csv(tmp_path, index=False)
+
+        # Save the signals as a channel-major binary array with a JSON index so that
+        # recording_query.py can read time ranges of single channels by offset
+        participant = os.path.splitext(filename)[0]
+        data_file = f"{participant}.npy"
+        with atomic_path(os.path.join(index_dir_path, data_file)) as tmp_path:
+            with open(tmp_path, 'wb') as f:
+                np.save(f, data)
+        meas_date = raw.info['meas_date']
+        index = {
+            'participant': participant,
+            'data_file': data_file,
+            'channels': channel_names,
+            'sfreq': raw.info['sfreq'],
+            'n_samples': data.shape[1],
+            'meas_date': meas_date.isoformat() if meas_date is not None else None,
+        }
+        with atomic_path(os.path.join(index_dir_path, f"{participant}.json")) as tmp_path:
+            with open(tmp_path, 'w') as f:
+                json.dump(index, f, indent=2)
+
+        ledger.mark_done(filename, [csv_file_path, os.path.join(index_dir_path, data_file), os.path.join(index_dir_path, f"{participant}.json")])
+        print(f"EDF data from {filename} has been successfully saved to {csv_file_path}")
+    except Exception as e:
+        ledger.mark_failed(filename, e)
+        print(f"An error occurred while processing the file {filename}: {e}")
@@ -0,0 +1,86 @@
+import os
+import json
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+# Directory written by main_1.py (one <participant>.npy + <participant>.json per recording)
+index_dir_path = r"C:\Users\Shree\Desktop\Projects\2023-hexoskin-study-data\overall_index"
+
+# List the participants that have been converted
+def list_participants(index_dir=index_dir_path):
+    return sorted(os.path.splitext(f)[0] for f in os.listdir(index_dir) if f.endswith('.json'))
+
+# Load the JSON index (channels, sampling rate, sample count, start time) of one recording
+def load_index(participant, index_dir=index_dir_path):
+    with open(os.path.join(index_dir, f"{participant}.json")) as f:
+        return json.load(f)
+
+# Find the rows of the requested channels; accepts full names ('4113:ECG_I') or labels ('ECG_I')
+def channel_rows(index, channels=None):
+    names = index['channels']
+    if channels is None:
+        return list(range(len(names))), list(names)
+
+    labels = [name.split(':', 1)[-1] for name in names]
+    rows = []
+    for channel in channels:
+        if channel in names:
+            rows.append(names.index(channel))
+        elif channel in labels:
+            rows.append(labels.index(channel))
+        else:
+            raise KeyError(f"Channel {channel} not found in {index['participant']}")
+    return rows, [names[row] for row in rows]
+
+# Convert a relative time (seconds) or an absolute time (datetime or ISO string) to seconds
+# from the start of the recording
+def to_seconds(t, index):
+    if t is None or isinstance(t, (int, float, np.integer, np.floating)):
+        return t
+    if isinstance(t, str):
+        t = datetime.fromisoformat(t)
+    if index['meas_date'] is None:
+        raise ValueError(f"Recording {index['participant']} has no start time; use relative times")
+    meas_date = datetime.fromisoformat(index['meas_date'])
+    if t.tzinfo is None:
+        t = t.replace(tzinfo=meas_date.tzinfo)
+    return (t - meas_date).total_seconds()
+
+# Read channels of one recording between start and stop without parsing the whole file.
+# The .npy file is memory-mapped, so only the requested sample range of each channel is read.
+def query_recording(participant, channels=None, start=None, stop=None, index_dir=index_dir_path):
+    index = load_index(participant, index_dir)
+    rows, names = channel_rows(index, channels)
+    fs = index['sfreq']
+    n_samples = index['n_samples']
+
+    start_s = to_seconds(start, index)
+    stop_s = to_seconds(stop, index)
+    start_sample = 0 if start_s is None else min(max(int(np.floor(start_s * fs)), 0), n_samples)
+    stop_sample = n_samples if stop_s is None else min(max(int(np.ceil(stop_s * fs)), start_sample), n_samples)
+
+    signals = np.load(os.path.join(index_dir, index['data_file']), mmap_mode='r')
+    block = np.stack([signals[row, start_sample:stop_sample] for row in rows]) if rows else np.empty((0, stop_sample - start_sample))
+
+    df = pd.DataFrame(block.T, columns=names)
+    df['Time (s)'] = np.arange(start_sample, stop_sample) / fs
+    return df
+
+# Query several participants at once; returns {participant: DataFrame}
+def query(participants=None, channels=None, start=None, stop=None, index_dir=index_dir_path):
+    if participants is None:
+        participants = list_participants(index_dir)
+    elif isinstance(participants, str):
+        participants = [participants]
+    return {
+        participant: query_recording(participant, channels, start, stop, index_dir)
+        for participant in participants
+    }
+
+
+if __name__ == "__main__":
+    # Example: ECG and accelerometer of the first 10 minutes for every participant
+    results = query(channels=['4113:ECG_I', '4145:accel_X', '4146:accel_Y', '4147:accel_Z'], start=0, stop=600)
+    for participant, df in results.items():
+        print(f"{participant}: {len(df)} samples, columns {list(df.columns)}")
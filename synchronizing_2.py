@@ -3,12 +3,18 @@ import numpy as np
 import pandas as pd
 from scipy.interpolate import interp1d
 import matplotlib.pyplot as plt
+from checkpoint import Ledger, atomic_path, file_size_estimate
+from recording_query import query_recording, load_index, index_dir_path
+from validation_1b import load_manifest, manifest_dir_path
 
 # Define paths
 input_folder = r"C:\Users\Shree\Desktop\Projects\2023-hexoskin-study-data\overall"
 output_folder = r"C:\Users\Shree\Desktop\Projects\2023-hexoskin-study-data\synchronizing_Data_2"
 os.makedirs(output_folder, exist_ok=True)  # Ensure output folder exists
 
+# Continue from the last run (False starts over from the first file)
+resume = True
+
 # Define a function to resample data
 def resample_data(data, original_fs, target_fs):
     time_original = np.linspace(0, len(data) / original_fs, len(data), endpoint=False)
@@ -16,60 +22,98 @@ def resample_data(data, original_fs, target_fs):
     interpolator = interp1d(time_original, data, kind='linear', fill_value='extrapolate')
     return interpolator(time_new)
 
+# Inputs of a converted file: the CSV, and the quality manifest and binary signals the stage
+# reads instead when the recording has been validated (re-validation reprocesses the file)
+def inputs(file_name):
+    participant = os.path.splitext(file_name)[0]
+    return [os.path.join(input_folder, file_name),
+            os.path.join(manifest_dir_path, f"{participant}.json"),
+            os.path.join(index_dir_path, f"{participant}.npy")]
+
+ledger = Ledger('synchronizing_2', resume=resume, source=inputs)
+csv_files = [f for f in os.listdir(input_folder) if f.endswith(".csv")]
+
 # Process CSV files
-for file_name in os.listdir(input_folder):
-    if file_name.endswith(".csv"):
-        print(f"Processing file: {file_name}")
-        
-        # Load the CSV
-        file_path = os.path.join(input_folder, file_name)
-        df = pd.read_csv(file_path)
-        print(f"Columns: {df.columns}")
-        
+for file_name in ledger.pending(csv_files, file_size_estimate(input_folder)):
+    print(f"Processing file: {file_name}")
+
+    try:
         # Define relevant columns (adjust based on actual column names in your data)
         ecg_column = '4113:ECG_I'
         accel_columns = ['4145:accel_X', '4146:accel_Y', '4147:accel_Z']
-        
+
+        # Sampling rates
+        fs_ecg = 256  # ECG data is at 256 Hz
+        start_time = 0.0
+
+        # The accelerometer records at 64 Hz, but MNE stores every channel at the container rate
+        # of the EDF file (the ECG rate), so the converted columns are at the rate in the index
+        participant = os.path.splitext(file_name)[0]
+        try:
+            fs_accel = load_index(participant)['sfreq']
+        except FileNotFoundError:
+            fs_accel = fs_ecg
+
+        # Use the quality manifest of validation_1b.py when the recording has been validated
+        manifest = load_manifest(participant)
+        if manifest is not None:
+            if manifest['status'] == 'bad':
+                print(f"Skipping {file_name}: marked bad by validation "
+                      f"(missing {manifest['missing_channels']}, usable {manifest['usable_fraction']:.0%})")
+                ledger.mark_skipped(file_name, "marked bad by validation")
+                continue
+
+            # Load only the usable span of the needed channels from the binary signals
+            start_time, stop_time = manifest['usable_span']
+            df = query_recording(participant, [ecg_column] + accel_columns, start_time, stop_time)
+        else:
+            # Load the CSV
+            file_path = os.path.join(input_folder, file_name)
+            df = pd.read_csv(file_path, usecols=lambda column: column in [ecg_column] + accel_columns)
+        print(f"Columns: {df.columns}")
+
         # Ensure relevant columns exist
         if ecg_column not in df.columns or not all(col in df.columns for col in accel_columns):
             print(f"Skipping {file_name} due to missing columns.")
+            ledger.mark_skipped(file_name, "missing columns")
             continue
-        
+
         # Extract ECG and accelerometer data
         ecg_data = df[ecg_column].dropna().values
         accel_data = df[accel_columns].dropna().values
-        
-        # Sampling rates
-        fs_ecg = 256  # ECG data is at 256 Hz
-        fs_accel = 64  # Accelerometer data is at 64 Hz
-        
+
         # Resample accelerometer data to match ECG sampling rate
         accel_resampled = np.array([resample_data(accel_data[:, i], fs_accel, fs_ecg) for i in range(accel_data.shape[1])]).T
-        
+
         # Calculate accelerometer magnitude
         accel_magnitude = np.sqrt(np.sum(accel_resampled**2, axis=1))
-        
-        # Generate timestamps (assuming the first sample starts at time 0)
-        timestamps = np.linspace(0, len(ecg_data) / fs_ecg, len(ecg_data), endpoint=False)
-        
+
+        # Generate timestamps (the first sample starts at the start of the usable span, 0 without a manifest)
+        timestamps = start_time + np.linspace(0, len(ecg_data) / fs_ecg, len(ecg_data), endpoint=False)
+
         # Ensure all arrays are of the same length
         min_length = min(len(timestamps), len(ecg_data), len(accel_magnitude))
         timestamps = timestamps[:min_length]
         ecg_data = ecg_data[:min_length]
         accel_magnitude = accel_magnitude[:min_length]
-        
+        accel_resampled = accel_resampled[:min_length]
+
         # Create the cleaned DataFrame
         cleaned_df = pd.DataFrame({
             'Timestamp': timestamps,
             'ECG': ecg_data,
-            'Accel_Magnitude': accel_magnitude
+            'Accel_Magnitude': accel_magnitude,
+            'Accel_X': accel_resampled[:, 0],
+            'Accel_Y': accel_resampled[:, 1],
+            'Accel_Z': accel_resampled[:, 2]
         })
-        
+
         # Save the cleaned file
         output_file_path = os.path.join(output_folder, f"cleaned_{file_name}")
-        cleaned_df.to_csv(output_file_path, index=False)
+        with atomic_path(output_file_path) as tmp_path:
+            cleaned_df.to_csv(tmp_path, index=False)
         print(f"Cleaned file saved: {output_file_path}")
-        
+
         # Plot the data
         plt.figure(figsize=(10, 6))
         plt.plot(timestamps, ecg_data, label='ECG')
@@ -78,12 +122,18 @@ for file_name in os.listdir(input_folder):
         plt.ylabel('Signal')
         plt.legend()
         plt.title(f"ECG and Accelerometer Data for {file_name}")
-        
+
         # Show the timestamps on the x-axis
         plt.xticks(timestamps[::int(len(timestamps)/10)], rotation=45)  # Show every 10th timestamp for better readability
-        
+
         # Save the plot
         plot_file_path = os.path.join(output_folder, f"plot_{os.path.splitext(file_name)[0]}.png")
         plt.savefig(plot_file_path)
         plt.close()
         print(f"Plot saved: {plot_file_path}")
+
+        ledger.mark_done(file_name, [output_file_path, plot_file_path])
+    except Exception as e:
+        plt.close('all')
+        ledger.mark_failed(file_name, e)
+        print(f"Error processing file {file_name}: {e}")
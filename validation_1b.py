@@ -0,0 +1,259 @@
+import os
+import json
+import numpy as np
+from checkpoint import Ledger, atomic_path
+import catalog
+import recording_query
+
+# Define the paths
+index_dir_path = r"C:\Users\Shree\Desktop\Projects\2023-hexoskin-study-data\overall_index"  # Binary signals written by main_1.py
+manifest_dir_path = r"C:\Users\Shree\Desktop\Projects\2023-hexoskin-study-data\overall_manifest"  # Quality manifests
+
+# Continue from the last run (False starts over from the first file)
+resume = True
+
+# Channels the later stages need, with their native sampling rates (Hz)
+expected_channels = {
+    '4113:ECG_I': 256,
+    '4145:accel_X': 64,
+    '4146:accel_Y': 64,
+    '4147:accel_Z': 64,
+}
+
+# Shortest run (seconds) reported as a bad span
+min_run_seconds = {'dropout': 0.1, 'flatline': 2, 'saturation': 0.1}
+merge_gap_seconds = 1       # Bad spans closer than this are merged
+min_usable_fraction = 0.5   # Recordings with less usable time are marked bad
+chunk_seconds = 600         # Samples are checked in 10-minute chunks
+max_overlap_seconds = 1     # Segment start times have a resolution of one second
+
+
+# Start and stop indices of the True runs of a boolean array
+def mask_runs(mask):
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    return np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+
+# Collects runs of a condition over consecutive chunks, joining runs that cross a chunk boundary
+class RunTracker:
+    def __init__(self, min_length):
+        self.min_length = min_length
+        self.open_start = None
+        self.runs = []
+        self.total = 0          # Samples in all runs
+        self.reported = 0       # Samples in the runs long enough to be reported
+
+    def close(self, start, stop):
+        self.total += stop - start
+        if stop - start >= self.min_length:
+            self.runs.append((int(start), int(stop)))
+            self.reported += stop - start
+
+    def feed(self, mask, offset):
+        starts, stops = mask_runs(mask)
+        starts += offset
+        stops += offset
+        if self.open_start is not None:
+            if len(starts) and starts[0] == offset:
+                starts[0] = self.open_start
+            else:
+                self.close(self.open_start, offset)
+            self.open_start = None
+        if len(stops) and stops[-1] == offset + len(mask):
+            self.open_start = starts[-1]
+            starts, stops = starts[:-1], stops[:-1]
+        for start, stop in zip(starts, stops):
+            self.close(start, stop)
+
+    def finish(self, end):
+        if self.open_start is not None:
+            self.close(self.open_start, end)
+            self.open_start = None
+
+
+# Dropout, flatline and saturation runs of one channel, checked chunk by chunk on the native
+# digital samples (records x samples per record, at the channel's native rate fs). MNE resamples
+# slower channels to the container rate, which smears flat and clipped runs, so the converted
+# signals are not used here. A dropout is a run at the digital minimum (the fill value),
+# saturation a run at the digital maximum.
+def check_channel(records, fs, channel):
+    trackers = {reason: RunTracker(max(1, int(seconds * fs))) for reason, seconds in min_run_seconds.items()}
+    samples_per_record = max(records.shape[1], 1)
+    chunk = max(1, int(chunk_seconds * fs) // samples_per_record)
+    previous = None
+    minimum, maximum = None, None
+    for start in range(0, len(records), chunk):
+        values = np.asarray(records[start:start + chunk], dtype=np.int32).ravel()
+        if not len(values):
+            continue
+        offset = start * samples_per_record
+        trackers['dropout'].feed(values == channel['digital_min'], offset)
+        first = values[0] + 1 if previous is None else previous
+        trackers['flatline'].feed(np.diff(np.concatenate(([first], values))) == 0, offset)
+        trackers['saturation'].feed(values == channel['digital_max'], offset)
+        minimum = values.min() if minimum is None else min(minimum, values.min())
+        maximum = values.max() if maximum is None else max(maximum, values.max())
+        previous = values[-1]
+    n = records.size
+    for tracker in trackers.values():
+        tracker.finish(n)
+
+    # Digital values to the physical units of the header
+    def physical(value):
+        gain = (channel['physical_max'] - channel['physical_min']) / (channel['digital_max'] - channel['digital_min'])
+        return float(channel['physical_min'] + (value - channel['digital_min']) * gain)
+
+    stats = {
+        'dropout_fraction': trackers['dropout'].total / max(n, 1),
+        'flatline_fraction': trackers['flatline'].total / max(n, 1),
+        'saturated_fraction': trackers['saturation'].total / max(n, 1),
+        'min': physical(minimum) if minimum is not None else None,
+        'max': physical(maximum) if maximum is not None else None,
+        'unit': channel['unit'],
+    }
+    return stats, {reason: tracker.runs for reason, tracker in trackers.items()}
+
+# Check the time base against the catalog: the gap between the end of this segment and the start
+# of the next segment of the same device (negative if they overlap) and, for EDF+D files, the
+# discontinuities between data records as [time in the recording (s), skipped time (s)].
+# The time column MNE writes is synthetic and always continuous, so it is not checked.
+def check_time_base(participant, recordings):
+    filename = f"{participant}.edf"
+    entry = recordings['files'].get(filename)
+    if entry is None or 'error' in entry:
+        return None
+
+    time_base = {'next_segment': None, 'gap_to_next_s': None, 'overlaps_next': False,
+                 'discontinuities': entry.get('discontinuities', [])}
+    segments = catalog.device_segments(recordings, entry['device']) if entry.get('device') else []
+    names = [segment[0] for segment in segments]
+    if filename in names and names.index(filename) + 1 < len(segments):
+        i = names.index(filename)
+        gap = (segments[i + 1][1] - segments[i][2]).total_seconds()
+        time_base['next_segment'] = segments[i + 1][0]
+        time_base['gap_to_next_s'] = gap
+        time_base['overlaps_next'] = gap < -max_overlap_seconds
+
+    return time_base
+
+# Merge overlapping or close spans (start, stop in seconds)
+def merge_spans(spans, gap):
+    merged = []
+    for start, stop in sorted(spans):
+        if merged and start <= merged[-1][1] + gap:
+            merged[-1][1] = max(merged[-1][1], stop)
+        else:
+            merged.append([start, stop])
+    return merged
+
+# Validate one converted recording and build its quality manifest
+def validate_recording(participant, recordings, edf_dir=catalog.edf_dir_path):
+    index = recording_query.load_index(participant, index_dir_path)
+    fs = index['sfreq']
+    duration = index['n_samples'] / fs
+
+    # The channel checks read the native samples of the EDF file
+    filename = f"{participant}.edf"
+    entry = recordings['files'].get(filename)
+    if entry is None or 'error' in entry:
+        raise ValueError(f"{filename} is not in the catalog or its header is unreadable")
+    channel_records = catalog.channel_records(os.path.join(edf_dir, filename), entry)
+
+    manifest = {
+        'participant': participant,
+        'sfreq': fs,
+        'n_samples': index['n_samples'],
+        'duration_s': duration,
+        'missing_channels': [c for c in expected_channels if c not in index['channels']],
+        'rate_mismatches': {},
+        'channels': {},
+        'bad_spans': [],
+    }
+
+    required_spans = []
+    for channel in entry['channels']:
+        name = channel['label']
+        if name == 'EDF Annotations':
+            continue
+        native_rate = channel['sfreq']
+        stats, runs = check_channel(channel_records[name], native_rate, channel)
+        stats['native_rate'] = native_rate
+        manifest['channels'][name] = stats
+
+        if name in expected_channels and native_rate != expected_channels[name]:
+            manifest['rate_mismatches'][name] = native_rate
+
+        # Run boundaries in native samples to seconds
+        for reason, channel_runs in runs.items():
+            spans = merge_spans([(start / native_rate, stop / native_rate) for start, stop in channel_runs], merge_gap_seconds)
+            manifest['bad_spans'] += [[start, stop, name, reason] for start, stop in spans]
+            if name in expected_channels:
+                required_spans += spans
+
+    manifest['time_base'] = check_time_base(participant, recordings)
+
+    # Usable span: the recording without the bad spans of the required channels at its start and end
+    bad = merge_spans(required_spans, merge_gap_seconds)
+    usable_start, usable_stop = 0.0, duration
+    for start, stop in bad:
+        if start <= usable_start + merge_gap_seconds:
+            usable_start = max(usable_start, stop)
+    for start, stop in reversed(bad):
+        if stop >= usable_stop - merge_gap_seconds:
+            usable_stop = min(usable_stop, start)
+    usable_stop = max(usable_stop, usable_start)
+    bad_inside = sum(min(stop, usable_stop) - max(start, usable_start) for start, stop in bad
+                     if stop > usable_start and start < usable_stop)
+    manifest['usable_span'] = [usable_start, usable_stop]
+    manifest['usable_fraction'] = (usable_stop - usable_start - bad_inside) / duration if duration else 0
+
+    if (manifest['missing_channels'] or manifest['rate_mismatches']
+            or (manifest['time_base'] is not None and manifest['time_base']['overlaps_next'])
+            or manifest['usable_fraction'] < min_usable_fraction):
+        manifest['status'] = 'bad'
+    elif manifest['bad_spans'] or (manifest['time_base'] is not None and manifest['time_base']['discontinuities']):
+        manifest['status'] = 'warn'
+    else:
+        manifest['status'] = 'ok'
+    return manifest
+
+# Load the quality manifest of a recording, or None if it has not been validated
+def load_manifest(participant, manifest_dir=manifest_dir_path):
+    path = os.path.join(manifest_dir, f"{participant}.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+if __name__ == "__main__":
+    os.makedirs(manifest_dir_path, exist_ok=True)
+
+    # Native sampling rates, digital ranges and file layout from the EDF headers
+    recordings = catalog.load_catalog()
+
+    # Memory needed to validate a recording: one chunk of one channel, independent of the file size
+    def estimate_memory(participant):
+        return int(chunk_seconds * 256 * 4 * 4)
+
+    # Inputs of a recording: its EDF file and the converted signals
+    def inputs(participant):
+        return [os.path.join(catalog.edf_dir_path, f"{participant}.edf"), os.path.join(index_dir_path, f"{participant}.npy")]
+
+    ledger = Ledger('validation_1b', resume=resume, source=inputs)
+    participants = recording_query.list_participants(index_dir_path)
+
+    for participant in ledger.pending(participants, estimate_memory):
+        print(f"Validating {participant}")
+        try:
+            manifest = validate_recording(participant, recordings)
+            manifest_file = os.path.join(manifest_dir_path, f"{participant}.json")
+            with atomic_path(manifest_file) as tmp_path:
+                with open(tmp_path, 'w') as f:
+                    json.dump(manifest, f, indent=2)
+
+            ledger.mark_done(participant, [manifest_file])
+            print(f"{participant}: {manifest['status']}, usable {manifest['usable_fraction']:.0%}, "
+                  f"{len(manifest['bad_spans'])} bad span(s). Manifest saved to {manifest_file}")
+        except Exception as e:
+            ledger.mark_failed(participant, e)
+            print(f"Error validating {participant}: {e}")